@@ -0,0 +1,115 @@
+"""
+Corpus synthétiques dans chaque format accepté par /upload (txt, csv, xlsx, pdf, pptx, docx).
+
+Chaque document décrit des produits (code REF-…) avec les phrases de retrieval_benchmark :
+les questions du benchmark citent ces codes.
+
+    python -m benchmarks.corpora --out /tmp/corpus --units 200
+"""
+import argparse
+import csv
+import os
+import random
+
+from benchmarks.retrieval_benchmark import build_corpus
+
+FORMATS = ["txt", "csv", "xlsx", "pdf", "pptx", "docx"]
+# Phrases par paragraphe, page ou diapositive
+SENTENCES_PER_UNIT = 5
+
+
+def _units(sentences: list) -> list:
+    return [sentences[i:i + SENTENCES_PER_UNIT] for i in range(0, len(sentences), SENTENCES_PER_UNIT)]
+
+
+def write_txt(path: str, sentences: list):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(" ".join(unit) for unit in _units(sentences)))
+
+
+def write_csv(path: str, rows: list):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["code", "description"])
+        writer.writerows(rows)
+
+
+def write_xlsx(path: str, rows: list):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Catalogue")
+    sheet.append(["code", "description"])
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(path)
+
+
+def write_pdf(path: str, sentences: list):
+    import fitz
+    doc = fitz.open()
+    for unit in _units(sentences):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), "\n".join(unit), fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def write_pptx(path: str, sentences: list):
+    from pptx import Presentation
+    from pptx.util import Inches
+    presentation = Presentation()
+    for i, unit in enumerate(_units(sentences)):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.title.text = f"Catalogue {i + 1}"
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(5))
+        box.text_frame.word_wrap = True
+        box.text_frame.text = "\n".join(unit)
+    presentation.save(path)
+
+
+def write_docx(path: str, sentences: list):
+    from docx import Document
+    document = Document()
+    for unit in _units(sentences):
+        document.add_paragraph(" ".join(unit))
+    document.save(path)
+
+
+WRITERS = {"txt": write_txt, "csv": write_csv, "xlsx": write_xlsx,
+           "pdf": write_pdf, "pptx": write_pptx, "docx": write_docx}
+# Formats tabulaires : une ligne (code, phrase) par produit
+TABULAR = {"csv", "xlsx"}
+
+
+def build_documents(out_dir: str, formats=FORMATS, docs_per_format: int = 1, units: int = 100,
+                    seed: int = 42) -> list:
+    """
+    Écrit docs_per_format documents par format (units unités de SENTENCES_PER_UNIT phrases).
+    Retourne [(chemin, format, [(code, phrase)…])] pour générer les questions.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    documents = []
+    for fmt in formats:
+        for n in range(docs_per_format):
+            corpus = build_corpus(units * SENTENCES_PER_UNIT, seed=rng.randint(0, 10 ** 9))
+            facts = [(code, text) for _, _, code, text in corpus]
+            path = os.path.join(out_dir, f"catalogue_{fmt}_{n}.{fmt}")
+            WRITERS[fmt](path, facts if fmt in TABULAR else [text for _, text in facts])
+            documents.append((path, fmt, facts))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--docs-per-format", type=int, default=1)
+    parser.add_argument("--units", type=int, default=100)
+    args = parser.parse_args()
+    for path, fmt, facts in build_documents(args.out, args.formats.split(","), args.docs_per_format, args.units):
+        print(f"[INFO] {path} : {len(facts)} phrases, {os.path.getsize(path)} octets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Benchmark de bout en bout de l'API : /upload, /url et /chat contre de faux Ollama,
+Cohere et site web locaux (latences configurables), dans un répertoire de travail
+isolé (Chroma, caches et mindmaps temporaires).
+
+Rapporte p50/p95/p99 par endpoint, la durée de chaque étape d'ingestion
+(extraction, indexation, mindmap) et le débit correspondant ; le JSON de sortie
+permet de comparer deux versions du code.
+
+    python -m benchmarks.e2e_benchmark --units 100 --chat 50 --output results.json
+    python -m benchmarks.e2e_benchmark --formats txt,csv --llm-latency 0.3 --rerank-latency 0.1
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.corpora import FORMATS, build_documents
+from benchmarks.fake_servers import start_fake_cohere, start_fake_ollama, start_fake_site
+from benchmarks.retrieval_benchmark import QUESTIONS, percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def latency_summary(values_ms: list) -> dict:
+    if not values_ms:
+        return {"n": 0}
+    return {
+        "n": len(values_ms),
+        "p50_ms": round(percentile(values_ms, 0.50), 1),
+        "p95_ms": round(percentile(values_ms, 0.95), 1),
+        "p99_ms": round(percentile(values_ms, 0.99), 1),
+        "mean_ms": round(statistics.mean(values_ms), 1),
+    }
+
+
+def _isolate(workdir: str, ollama_port: int, cohere_port: int, answer_cache: bool):
+    """Variables d'environnement lues à l'import de l'API : à poser avant `import main`."""
+    paths = {
+        "RAG_CHROMA_PATH": "chroma_db",
+        "RAG_EMBED_CACHE_PATH": "embedding_cache.sqlite3",
+        "RAG_INDEX_MANIFEST_PATH": "index_manifest.sqlite3",
+        "RAG_LEXICAL_INDEX_PATH": "lexical_index.sqlite3",
+        "RAG_HTTP_CACHE_PATH": "http_cache.sqlite3",
+        "RAG_SPOOL_DIR": "spool",
+        "RAG_MINDMAP_SECTION_CACHE_DIR": "mindmap_cache",
+    }
+    for name, relative in paths.items():
+        os.environ[name] = os.path.join(workdir, relative)
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{ollama_port}/v1"
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{ollama_port}"
+    os.environ["COHERE_BASE_URL"] = f"http://127.0.0.1:{cohere_port}"
+    os.environ.setdefault("COHERE_API_KEY", "benchmark")
+    os.environ.setdefault("RAG_RERANKER", "cohere")
+    if not answer_cache:
+        # Questions très proches d'un document à l'autre : on mesure le pipeline, pas le cache
+        os.environ["RAG_ANSWER_CACHE_THRESHOLD"] = "1.01"
+
+
+def _start_api(port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _wait_job(session, base: str, job_id: str, timeout: float) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = session.get(f"{base}/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} non terminé après {timeout}s")
+
+
+def _stage_summary(jobs: list) -> dict:
+    """Durée totale de chaque étape et débit (unités extraites/s, chunks indexés/s, mindmaps/s)."""
+    stages = {}
+    for stage, counter in (("extract_ms", "units"), ("index_ms", "chunks"), ("mindmap_ms", None)):
+        durations = [job["timings"][stage] for job in jobs if stage in job["timings"]]
+        if not durations:
+            continue
+        total = sum(job["progress"][counter] for job in jobs if stage in job["timings"]) if counter else len(durations)
+        stages[stage[:-3]] = {
+            **latency_summary(durations),
+            f"{counter or 'documents'}_per_sec": round(total / (sum(durations) / 1000), 1) if sum(durations) else None,
+        }
+    return stages
+
+
+def bench_uploads(session, base: str, documents: list, concurrency: int, timeout: float) -> dict:
+    def upload(document):
+        path, fmt, _ = document
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            response = session.post(f"{base}/upload", files={"file": (os.path.basename(path), f)})
+        request_ms = (time.perf_counter() - started) * 1000
+        response.raise_for_status()
+        job = _wait_job(session, base, response.json()["job_id"], timeout)
+        return fmt, request_ms, (time.perf_counter() - started) * 1000, job
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(upload, documents))
+
+    jobs = [job for _, _, _, job in results]
+    by_format = {}
+    for fmt, _, total_ms, job in results:
+        by_format.setdefault(fmt, {"ingest_ms": [], "chunks": 0})
+        by_format[fmt]["ingest_ms"].append(total_ms)
+        by_format[fmt]["chunks"] += job["progress"]["chunks"]
+    return {
+        "request": latency_summary([r for _, r, _, _ in results]),
+        "ingest": latency_summary([t for _, _, t, _ in results]),
+        "failed": [job["error"] for job in jobs if job["status"] == "failed"],
+        "stages": _stage_summary(jobs),
+        "formats": {fmt: {"ingest": latency_summary(v["ingest_ms"]), "chunks": v["chunks"]}
+                    for fmt, v in by_format.items()},
+    }
+
+
+def bench_urls(session, base: str, site_url: str, pages: int, timeout: float) -> dict:
+    """Page seule (froid puis inchangée), puis crawl du site via son sitemap (froid puis inchangé)."""
+    runs = {}
+    for name, payload in (
+        ("page_cold", {"url": f"{site_url}/page/1"}),
+        ("page_unchanged", {"url": f"{site_url}/page/1"}),
+        ("crawl_cold", {"url": f"{site_url}/sitemap.xml", "crawl": True, "max_pages": pages}),
+        ("crawl_unchanged", {"url": f"{site_url}/sitemap.xml", "crawl": True, "max_pages": pages}),
+    ):
+        started = time.perf_counter()
+        response = session.post(f"{base}/url", json=payload)
+        request_ms = (time.perf_counter() - started) * 1000
+        job = _wait_job(session, base, response.json()["job_id"], timeout)
+        runs[name] = {
+            "request_ms": round(request_ms, 1),
+            "ingest_ms": round((time.perf_counter() - started) * 1000, 1),
+            "status": job["status"],
+            "unchanged": bool((job["result"] or {}).get("unchanged")),
+            "chunks": job["progress"]["chunks"],
+            "timings": job["timings"],
+        }
+    return {"request": latency_summary([r["request_ms"] for r in runs.values()]), "runs": runs}
+
+
+def _read_sse(response) -> tuple:
+    """Retourne (ms jusqu'au premier token, timings de l'événement done)."""
+    started = time.perf_counter()
+    first_token_ms, event, done = None, None, {}
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            if event == "token" and first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            elif event == "done":
+                done = json.loads(line[6:])
+            elif event == "error":
+                raise RuntimeError(json.loads(line[6:])["error"])
+    return first_token_ms, done
+
+
+def bench_chat(session, base: str, documents: list, n: int, concurrency: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(n):
+        path, _, facts = rng.choice(documents)
+        code, _ = rng.choice(facts)
+        payloads.append({"message": rng.choice(QUESTIONS).format(code=code), "use_rag": True,
+                          "document_name": os.path.basename(path)})
+
+    def chat(payload):
+        started = time.perf_counter()
+        session.post(f"{base}/chat", json=payload).raise_for_status()
+        blocking_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with session.post(f"{base}/chat", json={**payload, "stream": True}, stream=True) as response:
+            first_token_ms, done = _read_sse(response)
+        return blocking_ms, first_token_ms, (time.perf_counter() - started) * 1000, done
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(chat, payloads))
+
+    server = {}
+    for key in ("retrieval_ms", "ttft_ms", "generation_ms"):
+        values = [done[key] for _, _, _, done in results if key in done]
+        if values:
+            server[key] = latency_summary(values)
+    for key in ("context_tokens", "tokens_saved"):
+        values = [done[key] for _, _, _, done in results if key in done]
+        if values:
+            server[f"{key}_mean"] = round(statistics.mean(values), 1)
+    return {
+        "blocking": latency_summary([r[0] for r in results]),
+        "stream_first_token": latency_summary([r[1] for r in results if r[1] is not None]),
+        "stream_total": latency_summary([r[2] for r in results]),
+        "server_timings": server,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--docs-per-format", type=int, default=2)
+    parser.add_argument("--units", type=int, default=50, help="paragraphes / pages / diapositives par document")
+    parser.add_argument("--chat", type=int, default=50, help="nombre de questions /chat")
+    parser.add_argument("--site-pages", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="délai avant le premier token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--rerank-latency", type=float, default=0.05)
+    parser.add_argument("--site-latency", type=float, default=0.01)
+    parser.add_argument("--answer-cache", action="store_true", help="laisse le cache de réponses actif")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--job-timeout", type=float, default=600)
+    parser.add_argument("--workdir", help="répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="rag_e2e_"))
+    os.makedirs(os.path.join(workdir, "mindmaps"), exist_ok=True)
+    ollama = start_fake_ollama(first_token_delay=args.llm_latency, token_delay=args.token_delay)
+    cohere = start_fake_cohere(latency=args.rerank_latency)
+    site = start_fake_site(pages=args.site_pages, latency=args.site_latency)
+    _isolate(workdir, ollama.server_port, cohere.server_port, args.answer_cache)
+
+    documents = build_documents(os.path.join(workdir, "corpus"), args.formats.split(","),
+                                args.docs_per_format, args.units)
+    # L'API sert mindmaps/ relativement au répertoire courant
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    started = time.perf_counter()
+    api = _start_api(args.port)
+    boot_seconds = time.perf_counter() - started
+
+    import requests
+    session = requests.Session()
+    base = f"http://127.0.0.1:{args.port}"
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "workdir")},
+        "cpu_count": os.cpu_count(),
+        "boot_s": round(boot_seconds, 2),
+        "upload": bench_uploads(session, base, documents, args.concurrency, args.job_timeout),
+        "url": bench_urls(session, base, f"http://127.0.0.1:{site.server_port}", args.site_pages, args.job_timeout),
+        "chat": bench_chat(session, base, documents, args.chat, args.concurrency),
+        "stats": session.get(f"{base}/stats").json(),
+        "workdir": workdir,
+    }
+    api.should_exit = True
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark des backends d'embedding : PyTorch fp32, ONNX Runtime fp32 et ONNX int8.
+
+Sur le corpus synthétique de retrieval_benchmark (chunks produits REF-xxxxx), mesure
+pour chaque backend : temps de chargement, mémoire, débit d'encodage du corpus,
+latence d'encodage d'une question, recall@5 (bon chunk dans le top 5) et accord
+avec la référence fp32 (part du top 5 PyTorch retrouvée, cosinus moyen des vecteurs).
+
+    python -m benchmarks.embedding_backend_benchmark --chunks 2000 --queries 200
+    python -m benchmarks.embedding_backend_benchmark --backends torch,onnx-int8 --threads 4
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.retrieval_benchmark import QUESTIONS, build_corpus, percentile
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help="le premier sert de référence")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="RAG_EMBED_THREADS (0 = défaut)")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    os.environ.setdefault("RAG_EMBED_CACHE_PATH", os.path.join(workdir, "embeddings.sqlite3"))
+    os.environ["RAG_EMBED_THREADS"] = str(args.threads)
+    # Le cache d'embeddings n'est pas utilisé : chaque backend encode tout le corpus
+    from rag_engine.embedder import EMBED_BACKENDS, _load_embed_model
+    from rag_engine.model_registry import estimate_memory_mb
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in EMBED_BACKENDS]
+    if unknown:
+        parser.error(f"backends inconnus : {', '.join(unknown)}")
+
+    corpus = build_corpus(args.chunks)
+    texts = [text for _, _, _, text in corpus]
+    rng = random.Random(7)
+    queries = [(i, rng.choice(QUESTIONS).format(code=corpus[i][2]))
+               for i in rng.sample(range(len(corpus)), min(args.queries, len(corpus)))]
+    report = {"chunks": len(corpus), "queries": len(queries), "batch_size": args.batch_size,
+              "threads": args.threads, "reference": backends[0], "backends": {}}
+
+    reference = None
+    for backend in backends:
+        started = time.perf_counter()
+        model = _load_embed_model(backend)
+        load_s = time.perf_counter() - started
+        model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # préchauffage
+
+        started = time.perf_counter()
+        vectors = normalize(np.asarray(model.encode(texts, batch_size=args.batch_size), dtype=np.float32))
+        encode_s = time.perf_counter() - started
+
+        latencies, top5 = [], []
+        for _, question in queries:
+            started = time.perf_counter()
+            query = normalize(np.asarray(model.encode([question]), dtype=np.float32)[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+            top5.append(np.argsort(-(vectors @ query))[:5])
+
+        result = {
+            "load_s": round(load_s, 2),
+            "memory_mb": round(estimate_memory_mb(model), 1),
+            "texts_per_s": round(len(texts) / encode_s, 1),
+            "query_ms_mean": round(float(np.mean(latencies)), 2),
+            "query_ms_p95": round(percentile(latencies, 0.95), 2),
+            "recall_at_5": round(sum(i in top for (i, _), top in zip(queries, top5)) / len(queries), 3),
+        }
+        if reference is None:
+            reference = (vectors, top5)
+        else:
+            ref_vectors, ref_top5 = reference
+            result["agreement_at_5"] = round(float(np.mean(
+                [len(set(top) & set(ref)) / 5 for top, ref in zip(top5, ref_top5)]
+            )), 3)
+            result["cosine_to_reference"] = round(float(np.mean(np.sum(vectors * ref_vectors, axis=1))), 4)
+            result["speedup"] = round(result["texts_per_s"] / report["backends"][backends[0]]["texts_per_s"], 2)
+        report["backends"][backend] = result
+        print(f"[INFO] {backend} : {json.dumps(result, ensure_ascii=False)}")
+        del model
+        gc.collect()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Serveurs locaux imitant les API externes, pour tester et mesurer sans Ollama.
+
+    python -m benchmarks.fake_servers --port 11435 --token-delay 0.02
+    OLLAMA_BASE_URL=http://127.0.0.1:11435/v1 uvicorn main:app
+
+start_fake_cohere() imite l'API de rerank ; start_fake_site() sert un petit site
+(pages liées, sitemap, ETag) pour le fetcher et le crawl.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "Selon les documents fournis, la réponse tient en quelques points : "
+    "le contexte est récupéré, reclassé puis résumé par le modèle."
+)
+
+
+DEFAULT_MINDMAP = "# Document\n## Produits\n- Garantie\n- Livraison\n## Fabrication\n- Villes"
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOllamaHandler(_JsonHandler):
+    """
+    Implémente /v1/chat/completions (streaming SSE ou non) et /v1/models, ainsi que
+    /api/chat (API native utilisée par le client ollama pour les mindmaps).
+    """
+
+    answer = DEFAULT_ANSWER
+    mindmap_answer = DEFAULT_MINDMAP
+    first_token_delay = 0.0
+    token_delay = 0.0
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "mistral", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") == "/api/chat":
+            time.sleep(self.first_token_delay + self.token_delay * len(self.mindmap_answer.split()))
+            self._send_json(200, {
+                "model": request.get("model", "mistral"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": self.mindmap_answer},
+                "done": True,
+                "done_reason": "stop",
+            })
+            return
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        model = request.get("model", "mistral")
+        tokens = self.answer.split(" ")
+        tokens = [t + " " for t in tokens[:-1]] + tokens[-1:]
+        tokens = tokens[:request.get("max_tokens") or len(tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        time.sleep(self.first_token_delay)
+
+        if not request.get("stream"):
+            time.sleep(self.token_delay * len(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send_chunk(delta: dict, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            send_chunk({"role": "assistant", "content": token} if i == 0 else {"content": token})
+        send_chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeCohereHandler(_JsonHandler):
+    """Implémente /v2/rerank : score = part des mots de la question présents dans le document."""
+
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") != "/v2/rerank":
+            self._send_json(404, {"message": "not found"})
+            return
+        time.sleep(self.latency)
+        query = set(request.get("query", "").lower().split())
+        documents = [d if isinstance(d, str) else d.get("text", "") for d in request.get("documents", [])]
+        scores = [len(query & set(d.lower().split())) / (len(query) or 1) for d in documents]
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        top_n = request.get("top_n") or len(documents)
+        self._send_json(200, {
+            "id": uuid.uuid4().hex,
+            "results": [{"index": i, "relevance_score": scores[i]} for i in order[:top_n]],
+            "meta": {"api_version": {"version": "2"}, "billed_units": {"search_units": 1}},
+        })
+
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    """
+    Site statique généré : /, /page/{i} (liens vers les pages enfants i*2+1 et i*2+2),
+    /sitemap.xml et /sitemap_index.xml. Répond 304 aux requêtes conditionnelles
+    tant que `version` ne change pas.
+    """
+
+    pages = 20
+    version = 1
+    latency = 0.0
+    last_modified = "Mon, 05 Jan 2026 10:00:00 GMT"
+    served = 0
+    not_modified = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _page(self, i: int) -> str:
+        links = "".join(f'<li><a href="/page/{c}#top">Page {c}</a></li>'
+                        for c in (i * 2 + 1, i * 2 + 2) if c < self.pages)
+        return (f"<html><head><title>Page {i}</title><style>body{{}}</style></head><body>"
+                f"<nav><a href='/'>Accueil</a></nav><h1>Page {i}</h1>"
+                f"<p>Contenu de la page {i}, version {self.version} : référence DOC-{i:05d}.</p>"
+                f"<ul>{links}</ul><footer>Pied de page</footer></body></html>")
+
+    def _respond(self, body: str, content_type: str, etag: str):
+        time.sleep(self.latency)
+        if self.headers.get("If-None-Match") == etag:
+            type(self).not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        type(self).served += 1
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        base = f"http://{self.headers.get('Host')}"
+        path = self.path.split("#")[0].rstrip("/") or "/"
+        if path == "/sitemap.xml":
+            urls = "".join(f"<url><loc>{base}/page/{i}</loc></url>" for i in range(self.pages))
+            body = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            self._respond(body, "application/xml", f'"sitemap-v{self.version}"')
+        elif path == "/sitemap_index.xml":
+            body = ('<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    f"<sitemap><loc>{base}/sitemap.xml</loc></sitemap></sitemapindex>")
+            self._respond(body, "application/xml", f'"index-v{self.version}"')
+        elif path == "/" or path.startswith("/page/"):
+            i = 0 if path == "/" else int(path.rsplit("/", 1)[1])
+            if i >= self.pages:
+                self.send_error(404)
+                return
+            self._respond(self._page(i), "text/html; charset=utf-8", f'"page-{i}-v{self.version}"')
+        else:
+            self.send_error(404)
+
+
+def _serve(handler, port: int, **attributes):
+    handler = type(handler.__name__, (handler,), attributes)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_fake_ollama(port: int = 0, first_token_delay: float = 0.0, token_delay: float = 0.0,
+                      answer: str = DEFAULT_ANSWER) -> ThreadingHTTPServer:
+    """Démarre le faux Ollama dans un thread ; l'URL de base est http://127.0.0.1:{server.server_port}/v1"""
+    return _serve(FakeOllamaHandler, port, first_token_delay=first_token_delay,
+                  token_delay=token_delay, answer=answer)
+
+
+def start_fake_cohere(port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Démarre le faux Cohere dans un thread ; COHERE_BASE_URL=http://127.0.0.1:{server.server_port}"""
+    return _serve(FakeCohereHandler, port, latency=latency)
+
+
+def start_fake_site(port: int = 0, pages: int = 20, latency: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Démarre le faux site dans un thread. server.RequestHandlerClass.version += 1 simule
+    une mise à jour de toutes les pages ; served / not_modified comptent les réponses.
+    """
+    return _serve(FakeSiteHandler, port, pages=pages, latency=latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama (API OpenAI)")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--cohere-port", type=int, help="démarre aussi le faux Cohere sur ce port")
+    parser.add_argument("--rerank-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    servers = [start_fake_ollama(args.port, args.first_token_delay, args.token_delay)]
+    print(f"[INFO] Faux Ollama sur http://127.0.0.1:{servers[0].server_port}/v1")
+    if args.cohere_port is not None:
+        servers.append(start_fake_cohere(args.cohere_port, args.rerank_latency))
+        print(f"[INFO] Faux Cohere sur http://127.0.0.1:{servers[1].server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
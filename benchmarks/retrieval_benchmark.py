@@ -0,0 +1,146 @@
+"""
+Benchmark hors ligne de la recherche : vecteurs seuls, BM25 seul, hybride (RRF).
+
+Corpus synthétique français/anglais où chaque chunk décrit un produit par un code
+(REF-xxxxx) : les questions citent le code, la bonne réponse est le chunk du produit.
+
+    python -m benchmarks.retrieval_benchmark --chunks 2000 --queries 200
+    python -m benchmarks.retrieval_benchmark --no-vector   # sans modèle d'embedding
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+TEMPLATES_FR = [
+    "Le produit {code} ({name}) est fabriqué à {city}. Sa garantie est de {years} ans et il pèse {weight} kg.",
+    "Fiche technique {code} : {name}, couleur {color}, livré depuis l'entrepôt de {city} sous {days} jours.",
+]
+TEMPLATES_EN = [
+    "Product {code} ({name}) is manufactured in {city}. It comes with a {years}-year warranty and weighs {weight} kg.",
+    "Datasheet {code}: {name}, {color} finish, shipped from the {city} warehouse within {days} days.",
+]
+QUESTIONS = [
+    "Quelle est la garantie du produit {code} ?",
+    "Where is {code} manufactured?",
+    "Combien pèse le {code} ?",
+    "What colour is {code}?",
+]
+NAMES = ["chaise ergonomique", "lampe de bureau", "standing desk", "office chair", "écran 27 pouces",
+         "wireless keyboard", "casque audio", "docking station", "tapis de souris", "webcam HD"]
+CITIES = ["Lyon", "Casablanca", "Rabat", "Berlin", "Lille", "Porto", "Montréal", "Tanger"]
+COLORS = ["noir", "blanc", "gris", "black", "silver", "rouge", "blue"]
+
+
+def build_corpus(n_chunks: int, seed: int = 42):
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n_chunks):
+        code = f"REF-{rng.randint(10000, 99999)}-{i}"
+        template = rng.choice(TEMPLATES_FR + TEMPLATES_EN)
+        text = template.format(
+            code=code, name=rng.choice(NAMES), city=rng.choice(CITIES), color=rng.choice(COLORS),
+            years=rng.randint(1, 5), weight=rng.randint(1, 30), days=rng.randint(1, 10),
+        )
+        source = f"catalogue_{i % 20}.pdf"
+        chunks.append((f"{source}_{i}", source, code, text))
+    return chunks
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(latencies_ms: list, hits: int, n: int) -> dict:
+    return {
+        "recall_at_5": round(hits / n, 3),
+        "latency_ms_mean": round(statistics.mean(latencies_ms), 3),
+        "latency_ms_p95": round(percentile(latencies_ms, 0.95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scoped", action="store_true", help="filtre chaque requête sur le document du chunk")
+    parser.add_argument("--no-vector", action="store_true")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    os.environ.setdefault("RAG_EMBED_CACHE_PATH", os.path.join(workdir, "embeddings.sqlite3"))
+    from rag_engine.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+    corpus = build_corpus(args.chunks)
+    rng = random.Random(7)
+    queries = [(c, rng.choice(QUESTIONS).format(code=c[2])) for c in rng.sample(corpus, min(args.queries, len(corpus)))]
+
+    index = LexicalIndex(os.path.join(workdir, "lexical.sqlite3"))
+    started = time.perf_counter()
+    index.add_many([(chunk_id, source, text) for chunk_id, source, _, text in corpus])
+    report = {
+        "chunks": len(corpus),
+        "queries": len(queries),
+        "scoped": args.scoped,
+        "lexical_index_build_s": round(time.perf_counter() - started, 3),
+    }
+
+    vectors = None
+    if not args.no_vector:
+        import numpy as np
+        from rag_engine.embedder import embed_text
+        started = time.perf_counter()
+        vectors = np.asarray(embed_text([text for _, _, _, text in corpus]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        report["embedding_s"] = round(time.perf_counter() - started, 3)
+        ids = np.array([chunk_id for chunk_id, _, _, _ in corpus])
+        sources = np.array([source for _, source, _, _ in corpus])
+
+    results = {"bm25": ([], 0), "vector": ([], 0), "hybrid": ([], 0)}
+    for (chunk_id, source, _, _), question in queries:
+        scope = source if args.scoped else None
+
+        started = time.perf_counter()
+        lexical = [c for c, _ in index.search(question, 10, scope)]
+        lexical_ms = (time.perf_counter() - started) * 1000
+        latencies, hits = results["bm25"]
+        latencies.append(lexical_ms)
+        results["bm25"] = (latencies, hits + (chunk_id in lexical[:5]))
+
+        if vectors is None:
+            continue
+        started = time.perf_counter()
+        query = np.asarray(embed_text([question])[0], dtype=np.float32)
+        scores = vectors @ (query / np.linalg.norm(query))
+        if scope:
+            scores = np.where(sources == scope, scores, -np.inf)
+        dense = list(ids[np.argsort(-scores)[:10]])
+        vector_ms = (time.perf_counter() - started) * 1000
+        latencies, hits = results["vector"]
+        latencies.append(vector_ms)
+        results["vector"] = (latencies, hits + (chunk_id in dense[:5]))
+
+        started = time.perf_counter()
+        fused = reciprocal_rank_fusion([dense, lexical])[:5]
+        fusion_ms = (time.perf_counter() - started) * 1000
+        latencies, hits = results["hybrid"]
+        latencies.append(vector_ms + lexical_ms + fusion_ms)
+        results["hybrid"] = (latencies, hits + (chunk_id in fused))
+
+    for name, (latencies, hits) in results.items():
+        if latencies:
+            report[name] = summarize(latencies, hits, len(queries))
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de la transcription Whisper segmentée : découpage aux silences puis
+transcription parallèle, comparée à un seul passage séquentiel.
+
+Audio synthétique : rafales "vocales" (sons modulés + bruit) séparées de silences
+de longueur aléatoire. On mesure la qualité des coupes (tombent-elles dans un
+silence ?) et le temps de transcription selon le nombre de processus.
+Le benchmark échoue si la part de coupes dans un silence est sous --min-cut-accuracy.
+
+    python -m benchmarks.whisper_segmentation_benchmark --minutes 10 --workers 1,2,4
+    python -m benchmarks.whisper_segmentation_benchmark --split-only   # sans whisper
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_speech(minutes: float, seed: int = 42):
+    """Retourne (pcm, intervalles de silence en échantillons)."""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    parts, silences, position = [], [], 0
+    while position < total:
+        burst = int(rng.uniform(2.0, 12.0) * SAMPLE_RATE)
+        t = np.arange(burst) / SAMPLE_RATE
+        pitch = rng.uniform(110, 260)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2, 6) * t)
+        voice = envelope * (0.3 * np.sin(2 * np.pi * pitch * t) + 0.05 * np_rng.standard_normal(burst))
+        gap = int(rng.uniform(0.3, 1.5) * SAMPLE_RATE)
+        parts.extend([voice.astype(np.float32), (0.002 * np_rng.standard_normal(gap)).astype(np.float32)])
+        silences.append((position + burst, position + burst + gap))
+        position += burst + gap
+    return np.concatenate(parts)[:total], silences
+
+
+def cut_accuracy(segments: list, silences: list) -> float:
+    cuts = [end for _, end in segments[:-1]]
+    if not cuts:
+        return 1.0
+    inside = sum(any(start <= cut <= end for start, end in silences) for cut in cuts)
+    return inside / len(cuts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, max(1, (os.cpu_count() or 2) // 2)})))
+    parser.add_argument("--split-only", action="store_true", help="mesure seulement le découpage")
+    parser.add_argument("--min-cut-accuracy", type=float, default=0.95,
+                        help="part minimale des coupes tombant dans un silence")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    # Toujours en mode segmenté, quelle que soit la durée de l'audio synthétique
+    os.environ.setdefault("RAG_LONG_AUDIO_MIN_SECONDS", "0")
+    from rag_engine.extractors import long_audio
+
+    pcm, silences = synthetic_speech(args.minutes)
+    started = time.perf_counter()
+    segments = long_audio.split_on_silence(pcm)
+    split_ms = (time.perf_counter() - started) * 1000
+    lengths = [(end - start) / SAMPLE_RATE for start, end in segments]
+    report = {
+        "audio_minutes": args.minutes,
+        "cpu_count": os.cpu_count(),
+        "split": {
+            "segments": len(segments),
+            "ms": round(split_ms, 2),
+            "min_seconds": round(min(lengths), 1),
+            "max_seconds": round(max(lengths), 1),
+            "cuts_in_silence": round(cut_accuracy(segments, silences), 3),
+        },
+        "transcription": [],
+    }
+
+    accuracy = report["split"]["cuts_in_silence"]
+    if accuracy < args.min_cut_accuracy:
+        print(json.dumps(report["split"], indent=2, ensure_ascii=False))
+        raise SystemExit(f"[ERREUR] Coupes dans un silence : {accuracy:.1%} < {args.min_cut_accuracy:.0%}")
+
+    if not args.split_only:
+        baseline = None
+        for workers in [int(n) for n in args.workers.split(",")]:
+            started = time.perf_counter()
+            long_audio.transcribe_segments(pcm, workers=workers)
+            seconds = time.perf_counter() - started
+            baseline = baseline or seconds
+            report["transcription"].append({
+                "workers": workers,
+                "seconds": round(seconds, 2),
+                "realtime_factor": round(args.minutes * 60 / seconds, 2),
+                "speedup": round(baseline / seconds, 2),
+            })
+            print(f"[INFO] {workers} processus : {seconds:.1f}s")
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,209 @@
-from fastapi import FastAPI, UploadFile, File, Body, BackgroundTasks
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from rag_engine.rag_pipeline import get_rag_answer, get_open_answer
-from rag_engine.embedder import embed_text
-from rag_engine.document_indexer import collection
-from rag_engine.extractors import extract_text_by_extension
-from rag_engine.url_loader import extract_text_from_url_or_youtube
-from rag_engine.mindmap_extractor import generate_mindmap_from_text
-from langchain.text_splitter import TokenTextSplitter
-from slugify import slugify
-import os
-
-app = FastAPI()
-
-app.mount("/mindmaps", StaticFiles(directory="mindmaps"), name="mindmaps")
-
-app.add_middleware(
-    CORSMiddleware,
-    # allow_origins=["http://localhost:5173"],  # Adaptable selon ton frontend
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# === Upload fichier ===
-@app.post("/upload")
-async def upload(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-
-    content = await file.read()
-    ext = file.filename.split(".")[-1].lower()
-
-    try:
-        text = extract_text_by_extension(content, ext)
-    except ValueError:
-        return {"error": f"Extension {ext} non supportée."}
-
-    chunks = chunk_text(text)
-    store_chunks(chunks, file.filename)
-
-    # Génération de mindmap en tâche de fond
-    background_tasks.add_task(generate_mindmap_from_text, text, file.filename)
-
-    return {
-        "message": f"{len(chunks)} morceaux enregistrés depuis {file.filename}",
-        "filename": file.filename
-    }
-
-# === Upload depuis URL ou YouTube ===
-@app.post("/url")
-async def process_url(url: str = Body(..., embed=True)):
-    try:
-        source_name = slugify(url)
-        text = extract_text_from_url_or_youtube(url)
-
-        chunks = chunk_text(text)
-        store_chunks(chunks, source_name)
-
-        return {
-            "message": f"{len(chunks)} morceaux extraits depuis l'URL",
-            "document_name": source_name
-        }
-    except Exception as e:
-        return {"error": str(e)}
-
-def chunk_text(text):
-    encoding_name = "cl100k_base"
-    splitter = TokenTextSplitter(
-        encoding_name=encoding_name,
-        chunk_size=500,
-        chunk_overlap=100,
-    )
-    return splitter.split_text(text)
-
-def store_chunks(chunks, file_name):
-    for idx, chunk in enumerate(chunks):
-        embedding = embed_text([chunk])
-        collection.upsert(
-            ids=[f"{file_name}_{idx}"],
-            documents=[chunk],
-            embeddings=embedding,
-            metadatas=[{"source": file_name, "chunk_index": idx}],
-        )
-
-class ChatRequest(BaseModel):
-    message: str
-    model: str = "mistral"
-    use_rag: bool = False
-    document_name: str | None = None
-
-class ChatResponse(BaseModel):
-    response: str
-
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    if request.use_rag:
-        result = get_rag_answer(request.message, request.model, request.document_name)
-    else:
-        result = get_open_answer(request.message, request.model)
-
-    return ChatResponse(response=result)
-
-
+import time
+_boot_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Body, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from rag_engine.rag_pipeline import get_rag_answer, get_open_answer, stream_rag_answer, stream_open_answer
+from rag_engine.ingestion_jobs import ingestion_queue, QueueFullError
+from rag_engine.embedder import embedding_cache
+from rag_engine.answer_cache import answer_cache
+from rag_engine.ingestion import check_embedding_model
+from rag_engine.index_router import index_router
+from rag_engine.model_registry import registry
+from rag_engine.extractors import resolve_extension, warm_up, startup_report
+from rag_engine.spool import new_spool_path, remove_quietly, UPLOAD_CHUNK_BYTES
+from rag_engine.url_loader import is_youtube_url
+from rag_engine.llm_gateway import llm_gateway, GatewayOverloadedError
+from rag_engine.markmap_renderer import install_assets
+from rag_engine.metrics import SERVER_TIMING, metrics, request_stages, server_timing_header, start_request
+from slugify import slugify
+import json
+import os
+import threading
+
+app = FastAPI()
+
+app.mount("/mindmaps", StaticFiles(directory="mindmaps"), name="mindmaps")
+
+app.add_middleware(
+    CORSMiddleware,
+    # allow_origins=["http://localhost:5173"],  # Adaptable selon ton frontend
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+boot_report = {}
+
+# === Mesures par requête : histogramme par route, détail par étape (Server-Timing) ===
+@app.middleware("http")
+async def timing_middleware(request, call_next):
+    stages = start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    labels = {"method": request.method, "route": route.path if route else "unmatched", "status": str(response.status_code)}
+    metrics.observe("rag_http_request_duration_seconds", elapsed, **labels)
+    if SERVER_TIMING:
+        # Réponses en streaming : le détail complet est dans l'événement done
+        response.headers["Server-Timing"] = server_timing_header(stages, elapsed)
+    return response
+
+# === Démarrage : préchargement optionnel des extracteurs (RAG_EXTRACTOR_WARMUP) ===
+@app.on_event("startup")
+def startup():
+    boot_report["import_seconds"] = round(time.perf_counter() - _boot_started, 3)
+    check_embedding_model()
+    started = time.perf_counter()
+    # Imports seulement : les modèles sont chargés dans les processus d'extraction, qui démarrent en fond
+    boot_report["warmed_up"] = warm_up(load_models=False)
+    boot_report["workers_prestarted"] = ingestion_queue.prestart()
+    # d3/markmap servis depuis /mindmaps/_assets : téléchargés au premier démarrage, en fond
+    threading.Thread(target=install_assets, name="markmap-assets", daemon=True).start()
+    boot_report["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"[INFO] API prête : import {boot_report['import_seconds']}s, préchargement {boot_report['warmup_seconds']}s {boot_report['warmed_up']}")
+
+# === Upload fichier ===
+@app.post("/upload")
+async def upload(file: UploadFile = File(...)):
+
+    ext = file.filename.split(".")[-1].lower()
+
+    try:
+        ext = resolve_extension(ext, file.content_type)
+    except ValueError:
+        return {"error": f"Extension {ext} non supportée."}
+
+    # Copie par blocs sur disque : le fichier n'est jamais entièrement en mémoire
+    upload_path = new_spool_path(f".{ext}")
+    with open(upload_path, "wb") as out:
+        while block := await file.read(UPLOAD_CHUNK_BYTES):
+            out.write(block)
+
+    # Extraction, découpage, embedding et mindmap se font dans la file d'ingestion
+    try:
+        job = ingestion_queue.submit_upload(upload_path, file.filename, ext, file.content_type)
+    except QueueFullError as e:
+        remove_quietly(upload_path)
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "message": f"Indexation de {file.filename} en cours",
+        "filename": file.filename,
+        "job_id": job.id
+    }
+
+# === Upload depuis URL ou YouTube ===
+@app.post("/url")
+async def process_url(
+    url: str = Body(..., embed=True),
+    crawl: bool = Body(False),
+    max_pages: int | None = Body(None),
+    max_depth: int | None = Body(None),
+):
+    try:
+        source_name = slugify(url)
+        if is_youtube_url(url):
+            fmt, crawl_options = "youtube", None
+        elif crawl:
+            # URL de départ ou sitemap : toutes les pages forment un seul document
+            fmt, crawl_options = "crawl", {"max_pages": max_pages, "max_depth": max_depth}
+        else:
+            fmt, crawl_options = "web", None
+        job = ingestion_queue.submit_url(url, source_name, fmt, crawl_options)
+
+        return {
+            "message": "Extraction de l'URL en cours",
+            "document_name": source_name,
+            "job_id": job.id
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+# === Suivi des jobs d'ingestion ===
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return job.to_dict()
+
+class ChatRequest(BaseModel):
+    message: str
+    model: str = "mistral"
+    use_rag: bool = False
+    document_name: str | None = None
+    stream: bool = False
+
+class ChatResponse(BaseModel):
+    response: str
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chat_events(request: ChatRequest):
+    """Flux SSE : un événement token par morceau, puis un événement done avec les temps."""
+    timings = {}
+    started = time.perf_counter()
+    try:
+        if request.use_rag:
+            tokens = stream_rag_answer(request.message, request.model, request.document_name, timings)
+        else:
+            tokens = stream_open_answer(request.message, request.model, timings)
+        for token in tokens:
+            yield _sse("token", {"content": token})
+    except Exception as e:
+        yield _sse("error", {"error": str(e)})
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    timings["stages"] = request_stages()
+    yield _sse("done", timings)
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest):
+    if request.stream:
+        # Générateur synchrone : itéré dans le threadpool, la boucle reste libre
+        return StreamingResponse(
+            _chat_events(request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        if request.use_rag:
+            result = await run_in_threadpool(get_rag_answer, request.message, request.model, request.document_name)
+        else:
+            result = await run_in_threadpool(get_open_answer, request.message, request.model)
+    except GatewayOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return ChatResponse(response=result)
+
+# === État des backends LLM (vérification immédiate) ===
+@app.get("/health/llm")
+async def llm_health():
+    backends = await run_in_threadpool(llm_gateway.health)
+    return {"healthy": any(b["healthy"] for b in backends), "backends": backends}
+
+# === Métriques Prometheus ===
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# === Statistiques des caches ===
+@app.get("/stats")
+async def stats_endpoint():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "index_router": index_router.stats(),
+        "models": registry.resident(),
+        "llm_backends": llm_gateway.stats(),
+        "boot": boot_report,
+        "extractors": startup_report(),
+    }
@@ -0,0 +1,109 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Similarité cosinus minimale entre deux questions pour réutiliser une réponse
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+
+class _Answer:
+    def __init__(self, group: tuple, vector, question: str, answer: str, cost_seconds: float):
+        self.group = group
+        self.vector = vector
+        self.question = question
+        self.answer = answer
+        self.cost_seconds = cost_seconds
+        self.created_at = time.time()
+
+
+class SemanticAnswerCache:
+    """
+    Cache de réponses RAG par (document, modèle) : une question dont l'embedding est
+    assez proche (cosinus) d'une question déjà traitée réutilise sa réponse.
+    Expiration par TTL, éviction LRU au-delà de max_entries.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question_embedding, document_name: str | None, model: str) -> str | None:
+        group = (document_name, model)
+        query = self._normalize(question_embedding)
+        now = time.time()
+        with self._lock:
+            ids = [i for i in self._groups.get(group, ()) if now - self._entries[i].created_at <= self.ttl]
+            for expired in set(self._groups.get(group, ())) - set(ids):
+                self._remove(expired)
+            if ids:
+                matrix = np.stack([self._entries[i].vector for i in ids])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[ids[best]]
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    self.seconds_saved += entry.cost_seconds
+                    return entry.answer
+            self.misses += 1
+        return None
+
+    def store(self, question_embedding, document_name: str | None, model: str, question: str,
+              answer: str, cost_seconds: float):
+        group = (document_name, model)
+        entry_id = next(self._ids)
+        with self._lock:
+            self._entries[entry_id] = _Answer(group, self._normalize(question_embedding), question, answer, cost_seconds)
+            self._groups.setdefault(group, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, document_name: str):
+        """Supprime les réponses liées au document, et celles des recherches sur tout le corpus."""
+        with self._lock:
+            for group in [g for g in self._groups if g[0] in (document_name, None)]:
+                for entry_id in list(self._groups[group]):
+                    self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        ids = self._groups.get(entry.group, [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._groups.pop(entry.group, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "seconds_saved": round(self.seconds_saved, 2),
+        }
+
+
+answer_cache = SemanticAnswerCache()
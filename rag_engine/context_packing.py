@@ -0,0 +1,152 @@
+import os
+import tiktoken
+from rag_engine.ingestion import CHUNK_ENCODING, CHUNK_OVERLAP
+
+# Tokens de contexte envoyés au LLM, en-têtes de passage "[source — position]" non comptés
+# (quelques tokens par passage)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+# En dessous, un chevauchement trouvé en comparant les textes est considéré comme fortuit
+MIN_TEXT_OVERLAP_CHARS = 20
+
+_encoding = None
+
+
+def _encoder():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(CHUNK_ENCODING)
+    return _encoding
+
+
+def _tokens(text: str) -> list:
+    return _encoder().encode(text, disallowed_special=())
+
+
+def _overlap_chars(previous: str, following: str, overlap_tokens: int = CHUNK_OVERLAP) -> int:
+    """Longueur du texte de `following` déjà présent à la fin de `previous` (chunks consécutifs)."""
+    # Cas normal : les overlap_tokens premiers tokens du chunk suivant terminent le précédent
+    expected = _encoder().decode(_tokens(following)[:overlap_tokens])
+    if expected and previous.endswith(expected):
+        return len(expected)
+    # Frontière de token différente au ré-encodage : recherche sur le texte
+    for size in range(min(len(previous), len(following)), MIN_TEXT_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def _table_prefix(text: str, meta: dict) -> str:
+    """Lignes répétées en tête d'un chunk tabulaire (feuille, en-tête de colonnes), "" hors tableau."""
+    if "row_start" not in meta:
+        return ""
+    n = 2 if "sheet" in meta else 1
+    lines = text.split("\n", n)
+    return "\n".join(lines[:n]) + "\n" if len(lines) > n else ""
+
+
+def _join(previous: str, previous_meta: dict, following: str, following_meta: dict) -> tuple:
+    """
+    Raccord de `following` à la suite de `previous` dans un passage : (caractères de début de
+    `following` déjà présents, séparateur). Chunks de texte : leur chevauchement, sans séparateur.
+    Chunks d'un même tableau : l'en-tête répété est retiré et les lignes restent séparées.
+    """
+    prefix = _table_prefix(following, following_meta)
+    if prefix:
+        return (len(prefix) if _table_prefix(previous, previous_meta) == prefix else 0), "\n"
+    overlap = _overlap_chars(previous, following)
+    return overlap, "" if overlap else "\n"
+
+
+def _position(metas: list) -> str:
+    """Position lisible du passage : pages, diapositives, lignes ou minutage."""
+    first, last = metas[0], metas[-1]
+    for key, label in (("page", "pages"), ("slide", "diapositives"), ("row", "lignes")):
+        if f"{key}_start" in first:
+            start, end = first[f"{key}_start"], last.get(f"{key}_end", first[f"{key}_start"])
+            position = f"{label} {start}-{end}" if end != start else f"{label[:-1]} {start}"
+            return f"feuille {first['sheet']}, {position}" if "sheet" in first else position
+    if "time_start" in first:
+        start, end = first["time_start"], last.get("time_end", first["time_start"])
+        return f"{int(start // 60)}:{int(start % 60):02d}-{int(end // 60)}:{int(end % 60):02d}"
+    if "sheet" in first:
+        return f"feuille {first['sheet']}"
+    return ""
+
+
+def pack_context(candidates: list, budget: int = CONTEXT_TOKEN_BUDGET) -> tuple:
+    """
+    candidates : [(id, texte, métadonnées)] du plus au moins pertinent (ordre du rerank).
+    Retient les chunks par pertinence tant que le budget de tokens le permet (le dernier est
+    tronqué), fusionne les chunks consécutifs d'un même document en retirant leur
+    chevauchement (ou l'en-tête répété d'un tableau), puis ordonne les passages par document et position.
+    Le budget porte sur le texte des passages ; leurs en-têtes s'y ajoutent.
+    Retourne (passages, rapport) ; rapport : tokens bruts, envoyés et économisés.
+    """
+    selected = {}  # (source, chunk_index) → texte
+    metas = {}
+    order = {}  # source → rang de son meilleur chunk
+    raw_tokens = used = 0
+    for rank, (chunk_id, text, meta) in enumerate(candidates):
+        meta = meta or {}
+        # Sans chunk_index (documents indexés avant son ajout), le chunk reste un passage isolé
+        key = (meta.get("source", chunk_id), meta.get("chunk_index", chunk_id))
+        if key in selected:
+            continue
+        n = len(_tokens(text))
+        # Ce qu'un voisin déjà retenu contient déjà ne coûte rien : chevauchement réel des
+        # chunks de texte, en-tête répété des chunks d'un même tableau
+        neighbours = shared = 0
+        if isinstance(key[1], int):
+            previous_key, following_key = (key[0], key[1] - 1), (key[0], key[1] + 1)
+            if previous_key in selected:
+                neighbours += 1
+                skip, _ = _join(selected[previous_key], metas[previous_key], text, meta)
+                shared += len(_tokens(text[:skip]))
+            if following_key in selected:
+                neighbours += 1
+                following = selected[following_key]
+                skip, _ = _join(text, meta, following, metas[following_key])
+                shared += len(_tokens(following[:skip]))
+        cost = max(n - shared, 0)
+        if used + cost > budget:
+            remaining = budget - used
+            if remaining < CHUNK_OVERLAP or neighbours:
+                break
+            text = _encoder().decode(_tokens(text)[:remaining])
+            cost = remaining
+        raw_tokens += n
+        used += cost
+        selected[key] = text
+        metas[key] = meta
+        order.setdefault(key[0], rank)
+
+    passages = []
+    for source in sorted(order, key=order.get):
+        indices = [index for s, index in selected if s == source]
+        runs = []
+        for index in sorted(i for i in indices if isinstance(i, int)):
+            if runs and index == runs[-1][-1] + 1:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+        runs += [[index] for index in indices if not isinstance(index, int)]
+        for run in runs:
+            text = selected[(source, run[0])]
+            for previous, index in zip(run, run[1:]):
+                following = selected[(source, index)]
+                skip, separator = _join(selected[(source, previous)], metas[(source, previous)],
+                                        following, metas[(source, index)])
+                text += separator + following[skip:]
+            position = _position([metas[(source, index)] for index in run])
+            header = f"[{source}{' — ' + position if position else ''}]"
+            passages.append(f"{header}\n{text}")
+
+    sent_tokens = sum(len(_tokens(p)) for p in passages)
+    report = {
+        "chunks": len(selected),
+        "passages": len(passages),
+        "raw_tokens": raw_tokens,
+        "context_tokens": sent_tokens,
+        "tokens_saved": max(raw_tokens - sent_tokens, 0),
+    }
+    return passages, report
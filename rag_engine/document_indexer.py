@@ -1,4 +1,7 @@
-import chromadb
-
-db = chromadb.PersistentClient(path="./chroma_db")
-collection = db.get_or_create_collection(name="documents")
+import os
+import chromadb
+
+CHROMA_PATH = os.getenv("RAG_CHROMA_PATH", "./chroma_db")
+
+db = chromadb.PersistentClient(path=CHROMA_PATH)
+collection = db.get_or_create_collection(name="documents")
@@ -1,8 +1,58 @@
-from sentence_transformers import SentenceTransformer
-
-#embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-#embed_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
-embed_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2", device='cpu')
-
-def embed_text(texts):
-    return embed_model.encode(texts).tolist()
+import os
+import numpy as np
+from rag_engine.embedding_cache import EmbeddingCache, text_hash
+from rag_engine.metrics import count, stage
+from rag_engine.model_registry import registry
+
+# Taille des micro-lots envoyés au modèle lors de l'encodage
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+
+#MODEL_NAME = "all-MiniLM-L6-v2"
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# Backend d'inférence : "torch" (fp32), "onnx" (ONNX Runtime fp32) ou "onnx-int8" (poids quantifiés)
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch")
+if EMBED_BACKEND not in EMBED_BACKENDS:
+    raise ValueError(f"RAG_EMBED_BACKEND inconnu : {EMBED_BACKEND} (attendu : {', '.join(EMBED_BACKENDS)})")
+# Threads de calcul de l'embedder (0 = défaut du backend, tous les cœurs pour ONNX)
+EMBED_THREADS = int(os.getenv("RAG_EMBED_THREADS", "0"))
+
+def _load_embed_model(backend: str | None = None):
+    backend = backend or EMBED_BACKEND
+    if backend == "torch":
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if EMBED_THREADS:
+            torch.set_num_threads(EMBED_THREADS)
+        return SentenceTransformer(MODEL_NAME, device='cpu')
+    from rag_engine.onnx_embedder import load_onnx_embedder
+    return load_onnx_embedder(MODEL_NAME, quantized=backend == "onnx-int8", threads=EMBED_THREADS)
+
+registry.register("embedder", _load_embed_model)
+
+# Identifie l'espace des vecteurs (modèle + backend) : clé du cache, et enregistrée dans le
+# manifeste d'index pour ne jamais mélanger deux espaces dans Chroma
+EMBED_MODEL_KEY = MODEL_NAME if EMBED_BACKEND == "torch" else f"{MODEL_NAME}@{EMBED_BACKEND}"
+embedding_cache = EmbeddingCache(EMBED_MODEL_KEY)
+
+def embed_text(texts, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Matrice float32 (un vecteur par texte), passée telle quelle à Chroma et au cache de réponses."""
+    hashes = [text_hash(t) for t in texts]
+    cached = embedding_cache.get_many(hashes)
+
+    # N'encode que les textes absents du cache (une seule fois par hash)
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in cached and h not in missing:
+            missing[h] = t
+    count("embed", "texts", len(texts))
+    count("embed", "encoded", len(missing))
+    if missing:
+        with stage("embed"), registry.use("embedder") as embed_model:
+            vectors = embed_model.encode(list(missing.values()), batch_size=batch_size)
+        computed = dict(zip(missing.keys(), np.asarray(vectors, dtype=np.float32)))
+        embedding_cache.put_many(computed)
+        cached.update(computed)
+
+    return np.array([cached[h] for h in hashes], dtype=np.float32)
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+EMBED_CACHE_PATH = os.getenv("RAG_EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache disque (SQLite) des embeddings, indexé par (modèle, sha256 du chunk).
+    Éviction LRU au-delà de max_entries. Le cache est vidé si le modèle change.
+    """
+
+    def __init__(self, model_name: str, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, hash TEXT, vector BLOB, last_used REAL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._invalidate_if_model_changed()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _invalidate_if_model_changed(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+        if row is None or row[0] != self.model_name:
+            if row is not None:
+                print(f"[INFO] Modèle d'embedding changé ({row[0]} → {self.model_name}), cache vidé")
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('model', ?)", (self.model_name,))
+            self._conn.commit()
+
+    def get_many(self, hashes: list) -> dict:
+        """Retourne {hash: vecteur float32} pour les hashes présents dans le cache."""
+        found = {}
+        if not hashes:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLite limite le nombre de paramètres par requête
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_name, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, self.model_name, h) for h in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, items: dict):
+        """Enregistre {hash: vecteur} puis évince les entrées les moins récemment utilisées."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in items.items()],
+            )
+            self._count += max(cursor.rowcount, 0)
+            if self._count > self.max_entries:
+                overflow = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._count -= overflow
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,71 @@
+# Fonctions exécutées dans les processus du pool d'ingestion.
+# Ce module n'importe ni Chroma ni l'embedder : les workers ne chargent que les extracteurs.
+import hashlib
+from functools import wraps
+from rag_engine.extractors import iter_units_by_extension
+from rag_engine.metrics import metrics
+from rag_engine.url_extractors.url_crawl import crawl_site
+from rag_engine.url_extractors.url_web import html_to_text
+from rag_engine.url_loader import extract_text_from_url_or_youtube, is_youtube_url
+from rag_engine.spool import write_units
+from rag_engine.web_fetcher import web_fetcher
+
+
+def _with_metrics(function):
+    """Renvoie (résultat, mesures du processus) : les mesures remontent au processus API."""
+    @wraps(function)
+    def wrapper(*args):
+        # Les mesures d'un job en échec partent avec le job suivant
+        result = function(*args)
+        return result, metrics.drain()
+    return wrapper
+
+
+def pages_hash(pages: list) -> str:
+    """Empreinte d'un document web : URL et hash du contenu de chacune de ses pages."""
+    digest = hashlib.sha256()
+    for url, content_hash in sorted((page.url, page.content_hash) for page in pages):
+        digest.update(f"{url}\0{content_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _page_units(pages):
+    """Texte de chaque page avec son URL ; les pages sans texte sont ignorées."""
+    for page in pages:
+        text = html_to_text(page.content)
+        if text.strip():
+            yield text, {"url": page.url}
+
+
+@_with_metrics
+def extract_upload(path: str, extension: str, mime_type: str | None, spool_path: str) -> tuple:
+    """Extrait le fichier uploadé unité par unité vers spool_path ; retourne (nombre d'unités, None)."""
+    return write_units(iter_units_by_extension(path, extension, mime_type), spool_path), None
+
+
+@_with_metrics
+def extract_url(url: str, crawl: dict | None, indexed_hash: str | None, spool_path: str) -> tuple:
+    """
+    crawl : options de crawl_site (max_pages, max_depth) ou None pour la seule page.
+    indexed_hash : empreinte des pages de la version indexée (manifeste d'index).
+    Retourne (nombre d'unités, empreinte des pages) ; (None, empreinte) si les pages sont
+    celles déjà indexées : rien n'est analysé ni écrit. Lève une erreur si aucune page ni aucun
+    texte n'a été extrait : le job échoue et la version indexée est conservée.
+    """
+    if is_youtube_url(url):
+        return write_units([extract_text_from_url_or_youtube(url)], spool_path), None
+
+    try:
+        pages = crawl_site(url, **crawl) if crawl is not None else [web_fetcher.fetch(url)]
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de l'extraction HTML depuis {url}: {e}")
+    if not pages:
+        # Sinon l'indexation d'un document vide supprimerait la version déjà indexée
+        raise RuntimeError(f"Aucune page extraite depuis {url}")
+    content_hash = pages_hash(pages)
+    if content_hash == indexed_hash:
+        return None, content_hash
+    units = write_units(_page_units(pages), spool_path)
+    if not units:
+        raise RuntimeError(f"Aucun texte extrait des {len(pages)} pages de {url}")
+    return units, content_hash
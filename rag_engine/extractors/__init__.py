@@ -1,33 +1,184 @@
-from rag_engine.extractors.pdf import extract_text_from_pdf
-from rag_engine.extractors.docx import extract_text_from_docx
-from rag_engine.extractors.txt import extract_text_from_txt
-from rag_engine.extractors.csv import extract_text_from_csv
-from rag_engine.extractors.xlsx import extract_text_from_xlsx
-from rag_engine.extractors.pptx import extract_text_from_pptx
-from rag_engine.extractors.audio import transcribe_audio
-from rag_engine.extractors.video import transcribe_video
-from rag_engine.extractors.image import extract_text_from_image
-
-
-def extract_text_by_extension(file_bytes: bytes, extension: str) -> str:
-    extension = extension.lower()
-    if extension == "pdf":
-        return extract_text_from_pdf(file_bytes)
-    elif extension == "docx":
-        return extract_text_from_docx(file_bytes)
-    elif extension == "txt":
-        return extract_text_from_txt(file_bytes)
-    elif extension == "csv":
-        return extract_text_from_csv(file_bytes)
-    elif extension == "xlsx":
-        return extract_text_from_xlsx(file_bytes)
-    elif extension == "pptx":
-        return extract_text_from_pptx(file_bytes)
-    elif extension in ["mp3", "wav", "m4a"]:
-        return transcribe_audio(file_bytes)
-    elif extension in ["png", "jpg", "jpeg"]:
-        return extract_text_from_image(file_bytes)
-    elif extension in "mp4":
-        return transcribe_video(file_bytes)
-    else:
-        raise ValueError(f"Extension de fichier non supportée : {extension}")
+import importlib
+import os
+import threading
+import time
+from rag_engine.metrics import count
+from rag_engine.model_registry import registry
+
+# Extension → (module, fonction, modèles utilisés). Les modules ne sont importés
+# qu'à la première demande du format : whisper, fitz, BLIP… ne ralentissent plus le démarrage.
+EXTRACTORS = {}
+MIME_TYPES = {}
+# Formats dont le générateur produit directement les chunks (tableaux : N lignes + en-tête)
+PRECHUNKED = set()
+
+# Extractions simultanées par famille de formats, ex. "media=1,vision=2,default=4"
+INGEST_LIMITS = os.getenv("RAG_INGEST_LIMITS", "media=1,vision=2,default=4")
+FORMAT_GROUPS = {
+    "mp3": "media", "wav": "media", "m4a": "media", "mp4": "media", "youtube": "media",
+    "pdf": "vision", "pptx": "vision", "png": "vision", "jpg": "vision", "jpeg": "vision",
+}
+
+# Formats à précharger au démarrage, ex. "pdf,mp3" ou "all" (vide = démarrage à froid)
+EXTRACTOR_WARMUP = os.getenv("RAG_EXTRACTOR_WARMUP", "")
+
+_loaded = {}
+_import_seconds = {}
+_import_errors = {}
+_lock = threading.Lock()
+
+
+def ingest_limits(spec: str = INGEST_LIMITS) -> dict:
+    """Limites d'extraction par famille de formats ; "default" s'applique aux autres formats."""
+    limits = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip()] = max(1, int(value))
+    limits.setdefault("default", 4)
+    return limits
+
+
+def format_group(extension: str) -> str:
+    return FORMAT_GROUPS.get(extension, "default")
+
+
+def warmup_extensions(group: str | None = None) -> list:
+    """Formats de RAG_EXTRACTOR_WARMUP, éventuellement limités à une famille."""
+    extensions = [e.strip().lower() for e in EXTRACTOR_WARMUP.split(",") if e.strip()]
+    if "all" in extensions:
+        extensions = list(EXTRACTORS)
+    if group is not None:
+        extensions = [e for e in extensions if format_group(e) == group]
+    return extensions
+
+
+def register_extractor(extensions, module: str, function: str, mime_types=(), models=(), iter_function=None,
+                       prechunked=False):
+    """
+    iter_function : générateur optionnel lisant un chemin de fichier unité par unité (page, diapo…).
+    prechunked : les unités de iter_function sont des chunks prêts à indexer, sans découpage en tokens.
+    """
+    for extension in extensions:
+        EXTRACTORS[extension] = (module, function, tuple(models), iter_function)
+        if prechunked:
+            PRECHUNKED.add(extension)
+    for mime_type in mime_types:
+        MIME_TYPES[mime_type] = extensions[0]
+
+
+register_extractor(["pdf"], "rag_engine.extractors.pdf", "extract_text_from_pdf",
+                   ["application/pdf"], models=["blip"], iter_function="iter_pdf_pages")
+register_extractor(["docx"], "rag_engine.extractors.docx", "extract_text_from_docx",
+                   ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+                   iter_function="iter_docx_paragraphs")
+register_extractor(["txt"], "rag_engine.extractors.txt", "extract_text_from_txt", ["text/plain"],
+                   iter_function="iter_txt_blocks")
+register_extractor(["csv"], "rag_engine.extractors.csv", "extract_text_from_csv", ["text/csv"],
+                   iter_function="iter_csv_rows", prechunked=True)
+register_extractor(["xlsx"], "rag_engine.extractors.xlsx", "extract_text_from_xlsx",
+                   ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
+                   iter_function="iter_xlsx_rows", prechunked=True)
+register_extractor(["pptx"], "rag_engine.extractors.pptx", "extract_text_from_pptx",
+                   ["application/vnd.openxmlformats-officedocument.presentationml.presentation"], models=["blip"],
+                   iter_function="iter_pptx_slides")
+register_extractor(["mp3", "wav", "m4a"], "rag_engine.extractors.audio", "transcribe_audio",
+                   ["audio/mpeg", "audio/wav", "audio/x-wav", "audio/mp4", "audio/x-m4a"], models=["whisper"],
+                   iter_function="iter_audio_segments")
+register_extractor(["png", "jpg", "jpeg"], "rag_engine.extractors.image", "extract_text_from_image",
+                   ["image/png", "image/jpeg"], models=["blip"])
+register_extractor(["mp4"], "rag_engine.extractors.video", "transcribe_video", ["video/mp4"], models=["whisper"],
+                   iter_function="iter_video_segments")
+
+
+def resolve_extension(extension: str | None = None, mime_type: str | None = None) -> str:
+    extension = (extension or "").lower()
+    if extension in EXTRACTORS:
+        return extension
+    if mime_type and mime_type.split(";")[0].strip() in MIME_TYPES:
+        return MIME_TYPES[mime_type.split(";")[0].strip()]
+    raise ValueError(f"Extension de fichier non supportée : {extension}")
+
+
+def is_prechunked(extension: str | None = None, mime_type: str | None = None) -> bool:
+    return resolve_extension(extension, mime_type) in PRECHUNKED
+
+
+def _load_module(module_name: str):
+    if module_name not in _loaded:
+        with _lock:
+            if module_name not in _loaded:
+                started = time.perf_counter()
+                _loaded[module_name] = importlib.import_module(module_name)
+                _import_seconds[module_name] = time.perf_counter() - started
+                print(f"[INFO] Extracteur {module_name} importé en {_import_seconds[module_name]:.2f}s")
+    return _loaded[module_name]
+
+
+def get_extractor(extension: str | None = None, mime_type: str | None = None):
+    """Retourne la fonction d'extraction du format, en important son module au premier appel."""
+    module_name, function_name, _, _ = EXTRACTORS[resolve_extension(extension, mime_type)]
+    return getattr(_load_module(module_name), function_name)
+
+
+def iter_units_by_extension(path: str, extension: str, mime_type: str | None = None):
+    """
+    Unités de texte (str ou (str, métadonnées)) extraites du fichier sur disque.
+    Les formats sans générateur sont extraits en une seule unité.
+    """
+    extension = resolve_extension(extension, mime_type)
+    module_name, function_name, _, iter_function = EXTRACTORS[extension]
+    module = _load_module(module_name)
+    if iter_function:
+        for unit in getattr(module, iter_function)(path):
+            count(f"extract_{extension}", "units")
+            yield unit
+        return
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    count(f"extract_{extension}", "units")
+    yield getattr(module, function_name)(file_bytes)
+
+
+def warm_up(extensions=None, load_models: bool = True) -> list:
+    """
+    Importe les extracteurs demandés (RAG_EXTRACTOR_WARMUP par défaut) et, si load_models,
+    charge leurs modèles. Les modèles ne servent que dans les processus d'extraction :
+    warm_up y est l'initializer du pool, le processus API ne fait que les imports.
+    Une erreur n'interrompt pas le démarrage : l'extracteur est signalé indisponible.
+    """
+    if extensions is None:
+        extensions = warmup_extensions()
+    if "all" in extensions:
+        extensions = list(EXTRACTORS)
+    warmed = []
+    for extension in extensions:
+        if extension not in EXTRACTORS:
+            print(f"[WARN] Préchargement ignoré, extension inconnue : {extension}")
+            continue
+        module_name = EXTRACTORS[extension][0]
+        try:
+            get_extractor(extension)
+            if load_models:
+                for model_name in EXTRACTORS[extension][2]:
+                    registry.get(model_name)
+        except Exception as e:
+            _import_errors[module_name] = str(e)
+            print(f"[WARN] Préchargement de {extension} impossible : {e}")
+            continue
+        warmed.append(extension)
+    return warmed
+
+
+def startup_report() -> dict:
+    """État des extracteurs : modules importés, temps d'import, modèles associés."""
+    return {
+        extension: {
+            "module": module_name,
+            "loaded": module_name in _loaded,
+            "error": _import_errors.get(module_name),
+            "import_seconds": round(_import_seconds.get(module_name, 0.0), 3),
+            "models": list(models),
+        }
+        for extension, (module_name, _, models, _) in EXTRACTORS.items()
+    }
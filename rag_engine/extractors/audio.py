@@ -1,10 +1,22 @@
-import whisper
-import tempfile
-
-def transcribe_audio(file_bytes):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
-    model = whisper.load_model("base")
-    result = model.transcribe(tmp_path)
-    return result["text"]
\ No newline at end of file
+import os
+from rag_engine.model_registry import registry
+
+WHISPER_MODEL = os.getenv("RAG_WHISPER_MODEL", "base")
+
+def _load_whisper():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL)
+
+# Le décodage Whisper installe des hooks sur le modèle : accès sérialisés
+registry.register("whisper", _load_whisper, exclusive=True)
+
+def transcribe_audio(file_bytes):
+    # ffmpeg lit les octets sur stdin et renvoie le PCM par stdout : aucun fichier temporaire
+    from rag_engine.extractors.long_audio import transcript_text
+    from rag_engine.extractors.media import decode_pcm
+    return transcript_text(decode_pcm(file_bytes))
+
+def iter_audio_segments(path):
+    """Transcription horodatée par blocs ; les longs enregistrements sont découpés et parallélisés."""
+    from rag_engine.extractors.long_audio import iter_transcript_units
+    yield from iter_transcript_units(path)
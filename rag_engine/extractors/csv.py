@@ -1,30 +1,28 @@
-import csv
-import io
-
-def extract_text_from_csv(file_bytes: bytes) -> str:
-    # Essayer de décoder avec utf-8, fallback latin-1
-    try:
-        decoded = file_bytes.decode("utf-8")
-    except UnicodeDecodeError:
-        decoded = file_bytes.decode("latin-1", errors="ignore")
-
-    stream = io.StringIO(decoded)
-    try:
-        reader = csv.DictReader(stream)
-        if reader.fieldnames is None:
-            raise ValueError("No header found, fallback to raw reader")
-
-        descriptions = []
-        for i, row in enumerate(reader):
-            sentence = ", ".join(
-                [f"{key.strip()}: {value.strip()}" for key, value in row.items()]
-            )
-            descriptions.append(f"Ligne {i+1} → {sentence}.")
-        return "\n".join(descriptions)
-
-    except Exception:
-        # fallback brut si échec DictReader
-        stream.seek(0)
-        reader = csv.reader(stream)
-        lines = ["\t".join(row) for row in reader]
-        return "\n".join(lines)
+import csv
+import io
+from rag_engine.extractors.table import cell_text, iter_table_chunks, trim_row
+from rag_engine.extractors.txt import detect_encoding
+
+
+def _iter_csv_chunks(stream):
+    """Chunks de lignes lus au fil du flux : la première ligne non vide sert d'en-tête."""
+    # Lignes numérotées comme dans un tableur : l'en-tête compte pour une ligne
+    records = enumerate((trim_row([cell_text(c) for c in cells]) for cells in csv.reader(stream)), start=1)
+    header = next((cells for _, cells in records if cells), None)
+    if header:
+        yield from iter_table_chunks(header, ((number, cells) for number, cells in records if cells))
+
+
+def extract_text_from_csv(file_bytes: bytes) -> str:
+    # Essayer de décoder avec utf-8, fallback latin-1
+    try:
+        decoded = file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        decoded = file_bytes.decode("latin-1", errors="ignore")
+    return "\n\n".join(text for text, _ in _iter_csv_chunks(io.StringIO(decoded, newline="")))
+
+
+def iter_csv_rows(path: str):
+    """Version streaming : chunks de TABLE_ROWS_PER_CHUNK lignes, en-tête répété, row_start/row_end."""
+    with open(path, encoding=detect_encoding(path), errors="ignore", newline="") as f:
+        yield from _iter_csv_chunks(f)
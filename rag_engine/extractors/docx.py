@@ -1,6 +1,20 @@
-from docx import Document
-from io import BytesIO
-
-def extract_text_from_docx(file_bytes):
-    doc = Document(BytesIO(file_bytes))
-    return "\n".join([para.text for para in doc.paragraphs])
\ No newline at end of file
+from docx import Document
+from io import BytesIO
+
+# Paragraphes regroupés par unité en streaming
+DOCX_PARAGRAPHS_PER_UNIT = 200
+
+def extract_text_from_docx(file_bytes):
+    doc = Document(BytesIO(file_bytes))
+    return "\n".join([para.text for para in doc.paragraphs])
+
+def iter_docx_paragraphs(path: str):
+    doc = Document(path)
+    block = []
+    for para in doc.paragraphs:
+        block.append(para.text)
+        if len(block) >= DOCX_PARAGRAPHS_PER_UNIT:
+            yield "\n".join(block)
+            block = []
+    if block:
+        yield "\n".join(block)
@@ -1,26 +1,155 @@
-from PIL import Image
-import pytesseract
-from io import BytesIO
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
-
-# Charger une seule fois
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
-def extract_text_from_image(file_bytes):
-    image = Image.open(BytesIO(file_bytes)).convert("RGB")
-
-    # OCR
-    # ocr_text = pytesseract.image_to_string(image)
-    ocr_text = pytesseract.image_to_string(image, lang="fra+eng")
-
-
-    # Description via BLIP
-    inputs = processor(image, return_tensors="pt")
-    out = model.generate(**inputs)
-    description = processor.decode(out[0], skip_special_tokens=True)
-
-    # Résumé enrichi
-    return f"🖼️ Description visuelle : {description}\n📜 Texte OCR : {ocr_text.strip()}"
-
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import pytesseract
+from io import BytesIO
+from rag_engine.metrics import count, stage, timed
+from rag_engine.model_registry import registry
+from rag_engine.extractors.image_cache import ImageAnalysisCache, image_hash
+
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+OCR_LANG = "fra+eng"
+
+# Images ignorées dans les documents (logos, puces, séparateurs…)
+IMAGE_MIN_SIDE = int(os.getenv("RAG_IMAGE_MIN_SIDE", "48"))
+IMAGE_MIN_BYTES = int(os.getenv("RAG_IMAGE_MIN_BYTES", "2048"))
+
+# Légendes BLIP générées par lots, OCR Tesseract en parallèle dans des threads
+BLIP_BATCH_SIZE = int(os.getenv("RAG_BLIP_BATCH_SIZE", "8"))
+BLIP_MAX_NEW_TOKENS = int(os.getenv("RAG_BLIP_MAX_NEW_TOKENS", "30"))
+OCR_THREADS = int(os.getenv("RAG_OCR_THREADS", str(min(4, os.cpu_count() or 1))))
+# Threads intra-op de torch (0 = valeur par défaut de torch)
+TORCH_THREADS = int(os.getenv("RAG_TORCH_THREADS", "0"))
+
+def _load_blip():
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
+    return processor, model
+
+# Chargé au premier usage puis partagé entre les requêtes
+registry.register("blip", _load_blip)
+
+_image_cache = None
+_ocr_pool = None
+
+def _ocr_executor() -> ThreadPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ThreadPoolExecutor(max_workers=OCR_THREADS, thread_name_prefix="ocr")
+    return _ocr_pool
+
+def image_cache() -> ImageAnalysisCache:
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageAnalysisCache(f"{BLIP_MODEL}|{OCR_LANG}")
+    return _image_cache
+
+@timed("ocr")
+def _ocr(image) -> str:
+    # ocr_text = pytesseract.image_to_string(image)
+    return pytesseract.image_to_string(image, lang=OCR_LANG).strip()
+
+def _caption_batches(images: list) -> list:
+    """
+    Légendes BLIP, par lots de BLIP_BATCH_SIZE images, dans l'ordre d'entrée.
+    Un lot en échec est ignoré avec un avertissement : ses images reçoivent l'exception à la place
+    de la légende, les autres lots sont légendés normalement.
+    """
+    import torch
+    if TORCH_THREADS > 0 and torch.get_num_threads() != TORCH_THREADS:
+        torch.set_num_threads(TORCH_THREADS)
+
+    captions = []
+    count("caption", "images", len(images))
+    try:
+        with stage("caption"), registry.use("blip") as (processor, model), torch.inference_mode():
+            for start in range(0, len(images), BLIP_BATCH_SIZE):
+                batch = images[start:start + BLIP_BATCH_SIZE]
+                try:
+                    inputs = processor(images=batch, return_tensors="pt", padding=True)
+                    out = model.generate(**inputs, max_new_tokens=BLIP_MAX_NEW_TOKENS)
+                    captions.extend(processor.batch_decode(out, skip_special_tokens=True))
+                except Exception as e:
+                    print(f"[WARN] Lot BLIP de {len(batch)} images ignoré : {e}")
+                    count("caption", "failed_images", len(batch))
+                    captions.extend([e] * len(batch))
+    except Exception as e:
+        # Modèle indisponible : aucune image restante n'est légendée
+        print(f"[WARN] Légendes BLIP indisponibles : {e}")
+        count("caption", "failed_images", len(images) - len(captions))
+        captions.extend([e] * (len(images) - len(captions)))
+    return captions
+
+def extract_text_from_images(images_bytes: list) -> list:
+    """
+    Analyse plusieurs images : OCR dans le pool de threads pendant que BLIP
+    génère les légendes par lots. Les résultats suivent l'ordre d'entrée.
+    """
+    results = [None] * len(images_bytes)
+    images = {}
+    for i, file_bytes in enumerate(images_bytes):
+        try:
+            images[i] = Image.open(BytesIO(file_bytes)).convert("RGB")
+        except Exception as e:
+            results[i] = f"⚠️ Erreur extraction image : {e}"
+    if not images:
+        return results
+
+    indices = list(images)
+    ocr_futures = [_ocr_executor().submit(_ocr, images[i]) for i in indices]
+
+    # Description via BLIP
+    captions = _caption_batches([images[i] for i in indices])
+
+    for i, description, ocr_future in zip(indices, captions, ocr_futures):
+        try:
+            ocr_text = ocr_future.result()
+        except Exception as e:
+            results[i] = f"⚠️ Erreur extraction image : {e}"
+            continue
+        if isinstance(description, Exception):
+            # Non mis en cache (préfixe ⚠️) : l'image sera ré-analysée au prochain envoi
+            results[i] = f"⚠️ Erreur extraction image : {description}"
+            continue
+        # Résumé enrichi
+        results[i] = f"🖼️ Description visuelle : {description}\n📜 Texte OCR : {ocr_text}"
+    return results
+
+def extract_text_from_image(file_bytes):
+    return extract_text_from_images([file_bytes])[0]
+
+def is_decorative(file_bytes: bytes, width: int | None = None, height: int | None = None) -> bool:
+    """Vrai pour les images trop petites pour porter de l'information."""
+    if len(file_bytes) < IMAGE_MIN_BYTES:
+        return True
+    if width is None or height is None:
+        try:
+            # Lit seulement l'en-tête, sans décoder l'image
+            width, height = Image.open(BytesIO(file_bytes)).size
+        except Exception:
+            return False
+    return min(width, height) < IMAGE_MIN_SIDE
+
+def analyze_images(images: list) -> list:
+    """
+    Analyse une liste d'images de document avec le cache disque : chaque contenu
+    distinct n'est analysé qu'une fois. Retourne None pour les images décoratives.
+    """
+    hashes = [None if is_decorative(b) else image_hash(b) for b in images]
+    results = image_cache().get_many([h for h in hashes if h])
+    count("image_analysis", "images", len(images))
+    count("image_analysis", "decorative", hashes.count(None))
+    count("image_analysis", "cache_hits", len(results))
+
+    # Une seule analyse par contenu absent du cache, en un seul lot
+    missing = {}
+    for h, file_bytes in zip(hashes, images):
+        if h and h not in results and h not in missing:
+            missing[h] = file_bytes
+    computed = dict(zip(missing, extract_text_from_images(list(missing.values()))))
+    image_cache().put_many({h: a for h, a in computed.items() if not a.startswith("⚠️")})
+    results.update(computed)
+
+    return [results[h] if h else None for h in hashes]
+
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+IMAGE_CACHE_PATH = os.getenv("RAG_IMAGE_CACHE_PATH", "./image_cache.sqlite3")
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("RAG_IMAGE_CACHE_MAX_ENTRIES", "100000"))
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class ImageAnalysisCache:
+    """
+    Cache disque (SQLite) des analyses d'images (BLIP + OCR), indexé par le sha256 de l'image.
+    La clé inclut la version de l'analyse : changer de modèle ou de langue OCR invalide le cache.
+    Partagé entre les processus d'extraction (SQLite en mode WAL).
+    """
+
+    def __init__(self, version: str, path: str = IMAGE_CACHE_PATH, max_entries: int = IMAGE_CACHE_MAX_ENTRIES):
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "version TEXT, hash TEXT, analysis TEXT, last_used REAL, "
+            "PRIMARY KEY (version, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_last_used ON analyses (last_used)")
+        self._conn.commit()
+
+    def get_many(self, hashes: list) -> dict:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, analysis FROM analyses WHERE version = ? AND hash IN ({placeholders})",
+                    [self.version, *part],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE analyses SET last_used = ? WHERE version = ? AND hash = ?",
+                    [(now, self.version, h) for h in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO analyses (version, hash, analysis, last_used) VALUES (?, ?, ?, ?)",
+                [(self.version, h, analysis, now) for h, analysis in items.items()],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE rowid IN "
+                    "(SELECT rowid FROM analyses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"version": self.version, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from rag_engine.model_registry import registry
+from rag_engine.extractors import ingest_limits
+from rag_engine.extractors.audio import WHISPER_MODEL  # enregistre aussi le modèle whisper
+from rag_engine.metrics import count, stage
+from rag_engine.extractors.media import SAMPLE_RATE, decode_pcm
+
+# Enregistrements plus longs : découpés aux silences et transcrits en parallèle
+LONG_AUDIO_MIN_SECONDS = float(os.getenv("RAG_LONG_AUDIO_MIN_SECONDS", "300"))
+# Longueur maximale d'un segment et longueur minimale avant de chercher un silence
+SEGMENT_MAX_SECONDS = float(os.getenv("RAG_AUDIO_SEGMENT_MAX_SECONDS", "90"))
+SEGMENT_MIN_SECONDS = float(os.getenv("RAG_AUDIO_SEGMENT_MIN_SECONDS", "30"))
+# Processus Whisper pour toute l'application, répartis entre les extractions média simultanées
+WHISPER_WORKERS = int(os.getenv("RAG_WHISPER_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Mémoire approximative d'un processus Whisper selon le modèle (Mo), pour le registre de modèles
+WHISPER_PROCESS_MB = {"tiny": 400, "base": 500, "small": 1200, "medium": 2800, "large": 5500}
+# Durée de transcription regroupée par unité transmise au découpage
+UNIT_SECONDS = 60.0
+FRAME_SECONDS = 0.03
+# Énergie moyennée sur cette durée avant de chercher un silence : un creux entre deux syllabes
+# (une seule trame) n'est pas un silence, une pause de ~300 ms en est un
+SILENCE_SMOOTH_SECONDS = float(os.getenv("RAG_AUDIO_SILENCE_SMOOTH_SECONDS", "0.3"))
+
+def _workers_per_job() -> int:
+    """Part de WHISPER_WORKERS revenant à une extraction média (RAG_INGEST_LIMITS media=…)."""
+    limits = ingest_limits()
+    return max(1, WHISPER_WORKERS // limits.get("media", limits["default"]))
+
+
+def _init_worker(threads: int):
+    # Évite que chaque processus prenne tous les cœurs
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(max(1, (os.cpu_count() or 1) // workers),),
+    )
+
+
+class SegmentPool:
+    """Processus de transcription des segments ; chacun charge son propre modèle Whisper."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = _process_pool(workers)
+        # Compté par le registre de modèles (plafond mémoire, /stats)
+        self.memory_mb = workers * WHISPER_PROCESS_MB.get(WHISPER_MODEL.split(".")[0], 1000)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+# Déclaré comme un modèle : visible dans le registre et fermé dès la fin de la transcription
+registry.register("whisper_segments", lambda: SegmentPool(_workers_per_job()), exclusive=True)
+
+
+def load_pcm(path: str) -> np.ndarray:
+    """Décode n'importe quel fichier audio/vidéo en PCM mono 16 kHz float32."""
+    return decode_pcm(path)
+
+
+def split_on_silence(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                     min_seconds: float = SEGMENT_MIN_SECONDS, max_seconds: float = SEGMENT_MAX_SECONDS) -> list:
+    """
+    Découpe en segments de min_seconds à max_seconds, en coupant au centre de la pause la plus
+    nette de chaque fenêtre autorisée : l'énergie par trame est moyennée sur SILENCE_SMOOTH_SECONDS,
+    son minimum est donc une suite de trames silencieuses et non un creux isolé au milieu d'un mot.
+    Retourne des couples (début, fin) en échantillons.
+    """
+    frame = max(1, int(FRAME_SECONDS * sample_rate))
+    n_frames = len(pcm) // frame
+    if n_frames == 0:
+        return [(0, len(pcm))] if len(pcm) else []
+    energy = np.sqrt(np.mean(pcm[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    # Fenêtre impaire centrée : le minimum lissé tombe au milieu de la pause
+    smooth = max(1, int(SILENCE_SMOOTH_SECONDS / FRAME_SECONDS)) | 1
+    if smooth > 1 and n_frames >= smooth:
+        padded = np.pad(energy, smooth // 2, mode="edge")
+        energy = np.convolve(padded, np.ones(smooth) / smooth, mode="valid")
+
+    min_frames = max(1, int(min_seconds * sample_rate / frame))
+    max_frames = max(min_frames + 1, int(max_seconds * sample_rate / frame))
+    segments, start = [], 0
+    while n_frames - start > max_frames:
+        window = energy[start + min_frames:start + max_frames]
+        cut = start + min_frames + int(np.argmin(window))
+        segments.append((start * frame, cut * frame))
+        start = cut
+    segments.append((start * frame, len(pcm)))
+    return segments
+
+
+def _transcribe_segment(pcm: np.ndarray, offset: float) -> list:
+    """Transcrit un segment (dans un processus du pool) ; horodatages décalés de offset secondes."""
+    with registry.use("whisper") as model:
+        result = model.transcribe(pcm, fp16=False)
+    return [(offset + s["start"], offset + s["end"], s["text"].strip()) for s in result["segments"]]
+
+
+def transcribe_segments(pcm: np.ndarray, workers: int | None = None) -> list:
+    """Transcription horodatée [(début, fin, texte)], parallèle au-delà de LONG_AUDIO_MIN_SECONDS."""
+    duration = len(pcm) / SAMPLE_RATE
+    count("whisper", "audio_seconds", round(duration, 1))
+    with stage("whisper"):
+        return _transcribe(pcm, duration, workers)
+
+
+def _transcribe(pcm: np.ndarray, duration: float, workers: int | None) -> list:
+    if duration < LONG_AUDIO_MIN_SECONDS or (workers or _workers_per_job()) <= 1:
+        return _transcribe_segment(pcm, 0.0)
+
+    def run(executor):
+        futures = [executor.submit(_transcribe_segment, pcm[start:end], start / SAMPLE_RATE)
+                   for start, end in split_on_silence(pcm)]
+        return [segment for future in futures for segment in future.result()]
+
+    if workers is not None:
+        with _process_pool(workers) as executor:
+            return run(executor)
+    try:
+        with registry.use("whisper_segments") as pool:
+            return run(pool.executor)
+    finally:
+        # Pas de processus Whisper résidents entre deux enregistrements longs
+        registry.evict("whisper_segments")
+
+
+def transcript_text(pcm: np.ndarray) -> str:
+    return " ".join(text for _, _, text in transcribe_segments(pcm) if text)
+
+
+def iter_transcript_units(path: str):
+    """Transcription regroupée par ~UNIT_SECONDS, avec time_start/time_end en métadonnées."""
+    block, block_start, block_end = [], None, None
+    for start, end, text in transcribe_segments(load_pcm(path)):
+        if not text:
+            continue
+        if block_start is None:
+            block_start = start
+        block.append(text)
+        block_end = end
+        if block_end - block_start >= UNIT_SECONDS:
+            yield " ".join(block), {"time_start": round(block_start, 2), "time_end": round(block_end, 2)}
+            block, block_start = [], None
+    if block:
+        yield " ".join(block), {"time_start": round(block_start, 2), "time_end": round(block_end, 2)}
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import threading
+import numpy as np
+from rag_engine.metrics import timed
+
+SAMPLE_RATE = 16000
+FFMPEG_BINARY = os.getenv("RAG_FFMPEG_BINARY", "ffmpeg")
+# Taille des blocs envoyés à ffmpeg par stdin
+PIPE_CHUNK_BYTES = 1024 * 1024
+
+
+def _command(source: str) -> list:
+    # PCM mono 16 kHz float32 sur stdout : le format attendu directement par Whisper
+    return [FFMPEG_BINARY, "-hide_banner", "-threads", "0", "-i", source, "-vn", "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-loglevel", "error", "pipe:1"]
+
+
+def _feed(stdin, data):
+    try:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            view = memoryview(data)
+            for offset in range(0, len(view), PIPE_CHUNK_BYTES):
+                stdin.write(view[offset:offset + PIPE_CHUNK_BYTES])
+        else:
+            # Objet fichier : copie par blocs sans tout charger
+            for block in iter(lambda: data.read(PIPE_CHUNK_BYTES), b""):
+                stdin.write(block)
+    except BrokenPipeError:
+        pass  # ffmpeg a abandonné : l'erreur est lue sur stderr
+    finally:
+        stdin.close()
+
+
+@timed("ffmpeg_decode")
+def decode_pcm(source) -> np.ndarray:
+    """
+    Décode un fichier audio/vidéo en PCM mono 16 kHz float32, sans fichier intermédiaire.
+    source : chemin (lu directement par ffmpeg), bytes ou objet fichier (envoyés par stdin).
+    """
+    from_path = isinstance(source, (str, os.PathLike))
+    process = subprocess.Popen(
+        _command(os.fspath(source) if from_path else "pipe:0"),
+        stdin=subprocess.DEVNULL if from_path else subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    feeder = None
+    if not from_path:
+        # Écriture dans un thread : stdin et stdout doivent avancer ensemble
+        feeder = threading.Thread(target=_feed, args=(process.stdin, source), daemon=True)
+        feeder.start()
+
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    pcm = bytearray()
+    for block in iter(lambda: process.stdout.read(PIPE_CHUNK_BYTES), b""):
+        pcm += block
+    process.wait()
+    reader.join()
+    if feeder:
+        feeder.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"Décodage ffmpeg impossible : {b''.join(stderr).decode(errors='replace').strip()}")
+    del pcm[len(pcm) - len(pcm) % 4:]
+    # Vue sur le tampon (sans copie) ; bytearray la rend modifiable, comme l'attend torch.from_numpy
+    return np.frombuffer(pcm, dtype=np.float32)
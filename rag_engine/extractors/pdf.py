@@ -1,23 +1,76 @@
-import fitz
-from rag_engine.extractors.image import extract_text_from_image  # <-- import depuis image.py
-
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    full_content = []
-
-    for page_index, page in enumerate(doc):
-        page_text = page.get_text("text")
-        full_content.append(f"\n📄 Page {page_index + 1} - Texte :\n{page_text.strip()}")
-
-        # Extraire les images de la page
-        images = page.get_images(full=True)
-        for img_index, img in enumerate(images):
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-
-            # Réutilise la fonction d’analyse d’image
-            image_analysis = extract_text_from_image(image_bytes)
-            full_content.append(f"\n🖼️ Page {page_index + 1} - Image {img_index + 1} :\n{image_analysis}")
-
-    return "\n\n".join(full_content)
+import os
+import fitz
+from rag_engine.extractors.image import analyze_images, image_hash, is_decorative  # <-- import depuis image.py
+from rag_engine.metrics import count, stage
+
+# Pages traitées (texte + images) avant d'être transmises au découpage
+PDF_WINDOW_PAGES = int(os.getenv("RAG_PDF_WINDOW_PAGES", "64"))
+
+def _open(source):
+    """source : chemin du fichier ou contenu en bytes."""
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+def _extract_pages(doc, start: int, end: int) -> list:
+    """Texte et références d'images (xref, largeur, hauteur) des pages [start, end)."""
+    pages = []
+    for page_index in range(start, end):
+        page = doc[page_index]
+        images = [(img[0], img[2], img[3]) for img in page.get_images(full=True)]
+        pages.append((page.get_text("text"), images))
+    return pages
+
+def iter_pdf_pages(source):
+    """
+    Produit les pages une à une (texte puis analyses d'images), fenêtre par fenêtre,
+    avec les métadonnées de page. Le texte est extrait dans le processus d'extraction lui-même
+    (get_text est rapide) : le document n'est ouvert qu'une fois et fermé à la fin du générateur.
+    """
+    with _open(source) as doc:
+        yield from _iter_pages(doc)
+
+def _iter_pages(doc):
+    page_count = doc.page_count
+    xref_hash = {}
+    seen = set()
+
+    for window_start in range(0, page_count, PDF_WINDOW_PAGES):
+        window_end = min(window_start + PDF_WINDOW_PAGES, page_count)
+
+        with stage("pdf_text"):
+            pages = _extract_pages(doc, window_start, window_end)
+        count("pdf_text", "pages", len(pages))
+
+        # Images : une seule extraction par xref, une seule analyse par contenu
+        to_analyze = {}
+        for _, images in pages:
+            for xref, width, height in images:
+                if xref in xref_hash:
+                    continue
+                image_bytes = doc.extract_image(xref)["image"]
+                if is_decorative(image_bytes, width, height):
+                    xref_hash[xref] = None
+                    continue
+                h = image_hash(image_bytes)
+                xref_hash[xref] = h
+                if h not in seen:
+                    to_analyze.setdefault(h, image_bytes)
+        with stage("pdf_images"):
+            analyses = dict(zip(to_analyze, analyze_images(list(to_analyze.values()))))
+
+        for page_index, (page_text, images) in enumerate(pages, start=window_start):
+            content = [f"\n📄 Page {page_index + 1} - Texte :\n{page_text.strip()}"]
+
+            for img_index, (xref, _, _) in enumerate(images):
+                h = xref_hash[xref]
+                # Une image répétée (logo, en-tête…) n'est décrite qu'à sa première apparition
+                if h is None or h in seen:
+                    continue
+                seen.add(h)
+                content.append(f"\n🖼️ Page {page_index + 1} - Image {img_index + 1} :\n{analyses[h]}")
+
+            yield "\n\n".join(content), {"page_start": page_index + 1, "page_end": page_index + 1}
+
+def extract_text_from_pdf(file_bytes: bytes) -> str:
+    return "\n\n".join(text for text, _ in iter_pdf_pages(file_bytes))
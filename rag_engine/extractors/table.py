@@ -0,0 +1,51 @@
+import os
+
+# Lignes de données par chunk tabulaire (l'en-tête est répété dans chaque chunk)
+TABLE_ROWS_PER_CHUNK = int(os.getenv("RAG_TABLE_ROWS_PER_CHUNK", "20"))
+# Un chunk est clos plus tôt s'il dépasse cette taille (lignes très larges)
+TABLE_CHUNK_MAX_CHARS = int(os.getenv("RAG_TABLE_CHUNK_MAX_CHARS", "2000"))
+
+SEPARATOR = " | "
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+
+def trim_row(cells: list) -> list:
+    """Retire les cellules vides de fin de ligne (fréquentes en lecture seule)."""
+    end = len(cells)
+    while end and not cells[end - 1]:
+        end -= 1
+    return cells[:end]
+
+
+def iter_table_chunks(header: list, rows, meta: dict | None = None,
+                      rows_per_chunk: int = TABLE_ROWS_PER_CHUNK, max_chars: int = TABLE_CHUNK_MAX_CHARS):
+    """
+    rows : (numéro de ligne, cellules) consommées au fil de l'eau.
+    Produit des chunks (texte, métadonnées) de rows_per_chunk lignes au plus, chacun
+    précédé de l'en-tête, avec row_start/row_end en plus de meta (ex. la feuille).
+    """
+    prefix = []
+    if meta and "sheet" in meta:
+        prefix.append(f"Feuille : {meta['sheet']}")
+    if header:
+        prefix.append(SEPARATOR.join(header))
+    prefix_chars = sum(len(line) + 1 for line in prefix)
+
+    block, size, first = [], prefix_chars, None
+    for number, cells in rows:
+        line = SEPARATOR.join(cells)
+        if block and (len(block) >= rows_per_chunk or size + len(line) > max_chars):
+            yield "\n".join(prefix + block), {**(meta or {}), "row_start": first, "row_end": last}
+            block, size = [], prefix_chars
+        if not block:
+            first = number
+        block.append(line)
+        size += len(line) + 1
+        last = number
+    if block:
+        yield "\n".join(prefix + block), {**(meta or {}), "row_start": first, "row_end": last}
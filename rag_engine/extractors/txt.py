@@ -1,5 +1,39 @@
-def extract_text_from_txt(file_bytes: bytes) -> str:
-    try:
-        return file_bytes.decode("utf-8")
-    except UnicodeDecodeError:
-        return file_bytes.decode("latin-1", errors="ignore")
+import codecs
+
+# Taille approximative (en caractères) d'un bloc de texte produit en streaming
+TXT_BLOCK_CHARS = 64 * 1024
+
+def extract_text_from_txt(file_bytes: bytes) -> str:
+    try:
+        return file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return file_bytes.decode("latin-1", errors="ignore")
+
+def detect_encoding(path: str) -> str:
+    """utf-8 si tout le fichier est valide, latin-1 sinon (vérifié par blocs)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+def iter_txt_blocks(path: str):
+    """Blocs de lignes d'environ TXT_BLOCK_CHARS caractères, coupés sur des fins de ligne."""
+    def flush(lines):
+        text = "".join(lines)
+        return text[:-1] if text.endswith("\n") else text
+
+    block, size = [], 0
+    with open(path, encoding=detect_encoding(path), errors="ignore", newline="") as f:
+        for line in f:
+            block.append(line)
+            size += len(line)
+            if size >= TXT_BLOCK_CHARS:
+                yield flush(block)
+                block, size = [], 0
+    if block:
+        yield flush(block)
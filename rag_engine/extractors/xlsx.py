@@ -1,14 +1,31 @@
-import openpyxl
-import io
-
-def extract_text_from_xlsx(file_bytes: bytes) -> str:
-    workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), data_only=True)
-    text = ""
-
-    for sheet in workbook.worksheets:
-        text += f"\n--- Feuille: {sheet.title} ---\n"
-        for row in sheet.iter_rows(values_only=True):
-            line = "\t".join([str(cell) if cell is not None else "" for cell in row])
-            text += line + "\n"
-
-    return text
+import openpyxl
+import io
+from rag_engine.extractors.table import cell_text, iter_table_chunks, trim_row
+
+
+def _iter_sheet_chunks(sheet):
+    """Chunks d'une feuille : la première ligne non vide sert d'en-tête, répété dans chaque chunk."""
+    records = enumerate((trim_row([cell_text(c) for c in row]) for row in sheet.iter_rows(values_only=True)), start=1)
+    header = next((cells for _, cells in records if cells), None)
+    if header:
+        yield from iter_table_chunks(header, ((number, cells) for number, cells in records if cells),
+                                     {"sheet": sheet.title})
+
+
+def _iter_workbook_chunks(source):
+    # Lecture seule : les lignes sont lues à la demande au lieu de charger tout le classeur
+    workbook = openpyxl.load_workbook(source, data_only=True, read_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _iter_sheet_chunks(sheet)
+    finally:
+        workbook.close()
+
+
+def extract_text_from_xlsx(file_bytes: bytes) -> str:
+    return "\n\n".join(text for text, _ in _iter_workbook_chunks(io.BytesIO(file_bytes)))
+
+
+def iter_xlsx_rows(path: str):
+    """Version streaming : chunks de TABLE_ROWS_PER_CHUNK lignes par feuille, métadonnées sheet/row_start/row_end."""
+    yield from _iter_workbook_chunks(path)
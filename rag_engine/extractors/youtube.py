@@ -1,19 +1,18 @@
-import yt_dlp
-import whisper
-import tempfile
-import os
-
-def extract_text_from_youtube(url):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': f'{tmpdir}/%(id)s.%(ext)s',
-            'quiet': True
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            audio_path = os.path.join(tmpdir, f"{info['id']}.{info['ext']}")
-
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_path)
-        return result["text"]
\ No newline at end of file
+import yt_dlp
+import tempfile
+import os
+from rag_engine.extractors.long_audio import transcript_text
+from rag_engine.extractors.media import decode_pcm
+
+def extract_text_from_youtube(url):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': f'{tmpdir}/%(id)s.%(ext)s',
+            'quiet': True
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            audio_path = os.path.join(tmpdir, f"{info['id']}.{info['ext']}")
+
+        return transcript_text(decode_pcm(audio_path))
\ No newline at end of file
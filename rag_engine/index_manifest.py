@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+
+INDEX_MANIFEST_PATH = os.getenv("RAG_INDEX_MANIFEST_PATH", "./index_manifest.sqlite3")
+
+
+class IndexManifest:
+    """
+    Manifeste des chunks indexés par document : id du chunk → hash de son contenu.
+    Permet de ne ré-encoder que les chunks nouveaux ou modifiés et de supprimer les chunks disparus.
+    Enregistre aussi la route de chaque document pour les recherches limitées à ce document.
+    """
+
+    def __init__(self, path: str = INDEX_MANIFEST_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "source TEXT, chunk_id TEXT, hash TEXT, chunk_index INTEGER, "
+            "PRIMARY KEY (source, chunk_id))"
+        )
+        # shard : "matrix" (recherche exacte en mémoire) ou nom de la collection Chroma dédiée
+        self._conn.execute("CREATE TABLE IF NOT EXISTS routes (source TEXT PRIMARY KEY, shard TEXT, chunks INTEGER)")
+        # Modèle d'embedding (modèle + backend) des vecteurs de chaque document et de l'index
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embedding_models (source TEXT PRIMARY KEY, model TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Empreinte du contenu source indexé (pages web), écrite une fois l'indexation réussie
+        self._conn.execute("CREATE TABLE IF NOT EXISTS contents (source TEXT PRIMARY KEY, content_hash TEXT)")
+        # Chunks en cours d'écriture : enregistrés avant l'écriture dans Chroma, effacés par replace().
+        # Après un échec d'indexation, ils restent listés et sont supprimés à la ré-indexation suivante.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_chunks (source TEXT, chunk_id TEXT, PRIMARY KEY (source, chunk_id))"
+        )
+        self._conn.commit()
+
+    def has_any(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is not None
+
+    def has(self, source: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def load(self, source: str) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id, hash FROM chunks WHERE source = ?", (source,)).fetchall()
+        return dict(rows)
+
+    def pending(self, source: str) -> list:
+        """Chunks écrits (ou en cours d'écriture) par une indexation qui n'a pas abouti."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM pending_chunks WHERE source = ?", (source,)).fetchall()
+        return [row[0] for row in rows]
+
+    def add_pending(self, source: str, chunk_ids: list):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pending_chunks (source, chunk_id) VALUES (?, ?)",
+                [(source, chunk_id) for chunk_id in chunk_ids],
+            )
+            self._conn.commit()
+
+    def replace(self, source: str, entries: list, embedding_model: str):
+        """
+        entries : liste de (chunk_id, hash, chunk_index) ; embedding_model : clé des vecteurs écrits.
+        Dans la même transaction, les chunks en attente du document sont oubliés.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM pending_chunks WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT INTO chunks (source, chunk_id, hash, chunk_index) VALUES (?, ?, ?, ?)",
+                [(source, chunk_id, h, idx) for chunk_id, h, idx in entries],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embedding_models (source, model) VALUES (?, ?)", (source, embedding_model)
+            )
+            self._conn.commit()
+
+    def embedding_model(self, source: str) -> str | None:
+        """Clé du modèle des vecteurs du document, None s'il a été indexé avant son enregistrement."""
+        with self._lock:
+            row = self._conn.execute("SELECT model FROM embedding_models WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def index_embedding_model(self, default: str) -> str:
+        """Clé du modèle de tout l'index ; enregistrée à default au premier appel."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'embedding_model'").fetchone()
+            if row is not None:
+                return row[0]
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('embedding_model', ?)", (default,))
+            self._conn.commit()
+        return default
+
+    def route(self, source: str) -> tuple | None:
+        """(shard, nombre de chunks) du document, None s'il a été indexé avant le routage."""
+        with self._lock:
+            return self._conn.execute("SELECT shard, chunks FROM routes WHERE source = ?", (source,)).fetchone()
+
+    def set_route(self, source: str, shard: str, chunks: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes (source, shard, chunks) VALUES (?, ?, ?)", (source, shard, chunks)
+            )
+            self._conn.commit()
+
+    def content_hash(self, source: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM contents WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def set_content_hash(self, source: str, content_hash: str | None):
+        with self._lock:
+            if content_hash is None:
+                self._conn.execute("DELETE FROM contents WHERE source = ?", (source,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO contents (source, content_hash) VALUES (?, ?)", (source, content_hash)
+                )
+            self._conn.commit()
+
+
+index_manifest = IndexManifest()
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+from rag_engine.document_indexer import collection, db
+from rag_engine.index_manifest import index_manifest
+from rag_engine.metrics import count
+
+# Documents jusqu'à cette taille : recherche exacte sur une matrice numpy de leurs vecteurs ;
+# au-delà, collection Chroma dédiée (index HNSW du seul document)
+ROUTE_MATRIX_MAX_CHUNKS = int(os.getenv("RAG_ROUTE_MATRIX_MAX_CHUNKS", "20000"))
+# Mémoire maximale des matrices gardées en cache (LRU par document)
+ROUTE_MATRIX_CACHE_MB = float(os.getenv("RAG_ROUTE_MATRIX_CACHE_MB", "512"))
+# Vecteurs copiés par lot vers une collection dédiée
+ROUTE_COPY_BATCH_SIZE = 1000
+
+MATRIX = "matrix"
+
+
+def shard_name(source: str) -> str:
+    """
+    Nom de collection Chroma valide (3-63 caractères alphanumériques) dérivé du document,
+    avec un suffixe de version : chaque reconstruction crée une nouvelle collection.
+    """
+    return f"doc_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:24]}_{uuid.uuid4().hex[:8]}"
+
+
+class _Matrix:
+    def __init__(self, ids: list, vectors: np.ndarray):
+        self.ids = np.array(ids)
+        self.vectors = vectors
+        self.squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+        self.norms = np.sqrt(self.squared_norms)
+        self.nbytes = vectors.nbytes + self.squared_norms.nbytes * 2 + self.ids.nbytes
+
+
+class IndexRouter:
+    """
+    Recherche vectorielle limitée à un document sans filtrer l'index HNSW global :
+    le manifeste associe chaque document à sa route (matrice en mémoire ou collection dédiée).
+    Les documents indexés avant le routage passent encore par la requête filtrée.
+    """
+
+    def __init__(self, matrix_max_chunks: int = ROUTE_MATRIX_MAX_CHUNKS, cache_mb: float = ROUTE_MATRIX_CACHE_MB):
+        self.matrix_max_chunks = matrix_max_chunks
+        self.cache_bytes = cache_mb * 1024 * 1024
+        # Même distance que la collection globale : les résultats ne dépendent pas de la route
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self._matrices = OrderedDict()
+        self._cached_bytes = 0
+        # Incrémentée à chaque ré-indexation : une matrice lue pendant l'indexation n'est pas gardée
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, source: str, chunks: int) -> str:
+        """
+        Appelé après l'indexation d'un document : choisit sa route et reconstruit sa collection dédiée si besoin.
+        La nouvelle collection est remplie sous un nouveau nom ; les requêtes utilisent l'ancienne route
+        jusqu'au basculement dans le manifeste, puis l'ancienne collection est supprimée.
+        """
+        self._forget(source)
+        shard = MATRIX if chunks <= self.matrix_max_chunks else shard_name(source)
+        previous = index_manifest.route(source)
+        if shard != MATRIX:
+            try:
+                self._build_shard(source, shard)
+            except Exception:
+                self._drop_shard(shard)
+                raise
+        index_manifest.set_route(source, shard, chunks)
+        if previous and previous[0] != MATRIX:
+            self._drop_shard(previous[0])
+        return shard
+
+    def query(self, query_embeddings, n_results: int, source: str | None = None) -> dict:
+        """Même format de résultat que collection.query (une seule question)."""
+        route = index_manifest.route(source) if source else None
+        if route is None:
+            count("vector_search", "filtered" if source else "global")
+            where = {"source": source} if source else None
+            return collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+        if route[0] != MATRIX:
+            count("vector_search", "shard")
+            try:
+                shard = db.get_collection(route[0])
+            except Exception:
+                # Route lue juste avant le basculement vers une collection reconstruite
+                return collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                        where={"source": source})
+            return shard.query(query_embeddings=query_embeddings, n_results=n_results)
+        count("vector_search", "matrix")
+        return self._query_matrix(source, np.asarray(query_embeddings, dtype=np.float32)[0], n_results)
+
+    def _query_matrix(self, source: str, query: np.ndarray, n_results: int) -> dict:
+        matrix = self._matrix(source)
+        n = min(n_results, len(matrix.ids))
+        if n == 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        scores = matrix.vectors @ query
+        if self.space == "cosine":
+            distances = 1 - scores / np.maximum(matrix.norms * np.linalg.norm(query), 1e-12)
+        elif self.space == "ip":
+            distances = 1 - scores
+        else:
+            distances = matrix.squared_norms - 2 * scores + float(query @ query)
+        top = np.argpartition(distances, n - 1)[:n] if n < len(distances) else np.arange(n)
+        top = top[np.argsort(distances[top])]
+        ids = [str(chunk_id) for chunk_id in matrix.ids[top]]
+        fetched = collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {chunk_id: (doc, meta) for chunk_id, doc, meta in
+                 zip(fetched["ids"], fetched["documents"], fetched["metadatas"])}
+        ranked = [(chunk_id, float(distances[i])) for chunk_id, i in zip(ids, top) if chunk_id in found]
+        return {
+            "ids": [[chunk_id for chunk_id, _ in ranked]],
+            "documents": [[found[chunk_id][0] for chunk_id, _ in ranked]],
+            "metadatas": [[found[chunk_id][1] for chunk_id, _ in ranked]],
+            "distances": [[distance for _, distance in ranked]],
+        }
+
+    def _matrix(self, source: str) -> _Matrix:
+        with self._lock:
+            if source in self._matrices:
+                self._matrices.move_to_end(source)
+                return self._matrices[source]
+            generation = self._generations.get(source, 0)
+        existing = collection.get(where={"source": source}, include=["embeddings"])
+        embeddings = existing["embeddings"]
+        if embeddings is None or not len(embeddings):
+            vectors = np.empty((0, 0), dtype=np.float32)
+        else:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+        matrix = _Matrix(existing["ids"], vectors)
+        with self._lock:
+            if self._generations.get(source, 0) != generation:
+                return matrix
+            if source not in self._matrices:
+                self._matrices[source] = matrix
+                self._cached_bytes += matrix.nbytes
+                while self._cached_bytes > self.cache_bytes and len(self._matrices) > 1:
+                    _, evicted = self._matrices.popitem(last=False)
+                    self._cached_bytes -= evicted.nbytes
+            return self._matrices[source]
+
+    def _forget(self, source: str):
+        with self._lock:
+            self._generations[source] = self._generations.get(source, 0) + 1
+            matrix = self._matrices.pop(source, None)
+            if matrix is not None:
+                self._cached_bytes -= matrix.nbytes
+
+    def _drop_shard(self, name: str):
+        try:
+            db.delete_collection(name)
+        except Exception as e:
+            print(f"[WARN] Collection {name} non supprimée : {e}")
+
+    def _build_shard(self, source: str, name: str):
+        """Copie les chunks du document depuis la collection globale (vecteurs déjà calculés)."""
+        shard = db.create_collection(name=name, metadata=collection.metadata)
+        offset = 0
+        while True:
+            page = collection.get(where={"source": source}, include=["embeddings", "documents", "metadatas"],
+                                  limit=ROUTE_COPY_BATCH_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            shard.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                         documents=page["documents"], metadatas=page["metadatas"])
+            offset += len(page["ids"])
+        print(f"[INFO] Collection dédiée {name} créée pour {source} ({offset} chunks)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "matrix_max_chunks": self.matrix_max_chunks,
+                "cached_matrices": len(self._matrices),
+                "cached_mb": round(self._cached_bytes / (1024 * 1024), 1),
+                "cache_mb": round(self.cache_bytes / (1024 * 1024), 1),
+            }
+
+
+index_router = IndexRouter()
@@ -0,0 +1,260 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import tiktoken
+from rag_engine.embedder import embed_text, EMBED_BATCH_SIZE, EMBED_MODEL_KEY, MODEL_NAME
+from rag_engine.embedding_cache import text_hash
+from rag_engine.document_indexer import collection
+from rag_engine.answer_cache import answer_cache
+from rag_engine.index_manifest import index_manifest
+from rag_engine.index_router import index_router
+from rag_engine.lexical_index import lexical_index
+from rag_engine.metrics import count, stage
+
+# Nombre de chunks encodés puis écrits ensemble dans Chroma
+UPSERT_BATCH_SIZE = int(os.getenv("RAG_UPSERT_BATCH_SIZE", "256"))
+# Ré-indexation incrémentale : seuls les chunks nouveaux ou modifiés sont encodés
+INCREMENTAL_INDEXING = os.getenv("RAG_INCREMENTAL_INDEXING", "1") == "1"
+
+CHUNK_ENCODING = "cl100k_base"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+
+# Un verrou par document en cours d'indexation : {document: [verrou, utilisateurs]}
+_document_locks = {}
+_document_locks_guard = threading.Lock()
+
+
+@contextmanager
+def document_lock(file_name: str):
+    """
+    Sérialise les indexations d'un même document : deux envois simultanés ne lisent pas les mêmes
+    chunks précédents avant que l'un d'eux n'écrive. Ré-entrant pour le thread qui le détient.
+    """
+    with _document_locks_guard:
+        entry = _document_locks.setdefault(file_name, [threading.RLock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _document_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _document_locks[file_name]
+
+
+def _merge_metadata(metas: list) -> dict:
+    """Fusionne les métadonnées des unités d'un chunk : *_end prend la dernière valeur, le reste la première."""
+    merged = {}
+    for meta in metas:
+        for key, value in meta.items():
+            if key.endswith("_end") or key not in merged:
+                merged[key] = value
+    return merged
+
+
+def iter_chunks(units, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """
+    Découpage en fenêtres de chunk_size tokens se chevauchant de chunk_overlap tokens : les unités
+    (str ou (str, métadonnées)) sont consommées au fil de l'eau et seuls ~chunk_size tokens restent en mémoire.
+    Produit des couples (chunk, métadonnées fusionnées des unités couvertes).
+    """
+    encoding = tiktoken.get_encoding(CHUNK_ENCODING)
+    tokens = []
+    spans = []  # (position du premier token de l'unité dans tokens, métadonnées)
+
+    def window_meta(end):
+        return _merge_metadata([meta for start, meta in spans if start < end])
+
+    for index, unit in enumerate(units):
+        text, meta = unit if isinstance(unit, tuple) else (unit, {})
+        spans.append((len(tokens), meta))
+        tokens.extend(encoding.encode(text if index == 0 else "\n" + text, disallowed_special=()))
+
+        while len(tokens) > chunk_size:
+            yield encoding.decode(tokens[:chunk_size]), window_meta(chunk_size)
+            step = chunk_size - chunk_overlap
+            tokens = tokens[step:]
+            # Décale les unités ; celle qui chevauche le début de la fenêtre est conservée
+            shifted = [(start - step, meta) for start, meta in spans]
+            first = max([i for i, (start, _) in enumerate(shifted) if start <= 0], default=0)
+            spans = [(max(start, 0), meta) for start, meta in shifted[first:]]
+
+    if tokens:
+        yield encoding.decode(tokens), window_meta(len(tokens))
+
+
+def _batched(items, size):
+    iterator = iter(items)
+    start = 0
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+
+def _chunk_ids(file_name: str, hashes: list, occurrences: dict) -> list:
+    """Ids dérivés du contenu ; un chunk répété dans le document reçoit un suffixe."""
+    ids = []
+    for h in hashes:
+        n = occurrences.get(h, 0)
+        occurrences[h] = n + 1
+        ids.append(f"{file_name}_{h[:16]}" if n == 0 else f"{file_name}_{h[:16]}_{n}")
+    return ids
+
+
+def _write_batch(file_name: str, new: dict, reused: dict, reused_texts: list):
+    """new : {"ids", "documents", "embeddings", "metadatas"} ; reused : {"ids", "metadatas"}."""
+    if new["ids"]:
+        with stage("chroma_upsert"):
+            collection.upsert(**new)
+        with stage("lexical_index"):
+            lexical_index.add_many([(chunk_id, file_name, text) for chunk_id, text in zip(new["ids"], new["documents"])])
+    if reused["ids"]:
+        # Contenu inchangé : seule la position (chunk_index, pages…) est mise à jour
+        with stage("chroma_update"):
+            collection.update(**reused)
+        missing = [(chunk_id, file_name, text) for chunk_id, text in zip(reused["ids"], reused_texts)
+                   if chunk_id not in lexical_index]
+        with stage("lexical_index"):
+            lexical_index.add_many(missing)
+    return len(new["ids"]) + len(reused["ids"])
+
+
+def check_embedding_model():
+    """
+    Refuse de démarrer si l'index a été construit avec un autre modèle ou backend d'embedding :
+    les requêtes seraient comparées à des vecteurs d'un autre espace.
+    Un index antérieur à l'enregistrement de la clé vient du backend torch (seul disponible alors).
+    """
+    legacy = MODEL_NAME if index_manifest.has_any() or collection.count() else EMBED_MODEL_KEY
+    indexed = index_manifest.index_embedding_model(legacy)
+    if indexed != EMBED_MODEL_KEY:
+        raise RuntimeError(
+            f"L'index a été construit avec l'embedding {indexed} mais RAG_EMBED_BACKEND donne {EMBED_MODEL_KEY}. "
+            f"Revenez au backend d'origine, ou videz l'index (RAG_CHROMA_PATH, RAG_INDEX_MANIFEST_PATH, "
+            f"RAG_LEXICAL_INDEX_PATH) avant de ré-indexer les documents."
+        )
+
+
+def _previous_ids(file_name: str) -> dict:
+    """
+    Chunks actuellement indexés pour le document : {id: hash} (hash None hors manifeste).
+    Inclut les chunks laissés par une indexation interrompue, pour qu'ils soient supprimés.
+    """
+    if index_manifest.has(file_name):
+        previous = index_manifest.load(file_name)
+        # Vecteurs d'un autre modèle ou backend : aucun chunk n'est réutilisé, tout est ré-encodé
+        if (index_manifest.embedding_model(file_name) or MODEL_NAME) != EMBED_MODEL_KEY:
+            previous = {chunk_id: None for chunk_id in previous}
+        for chunk_id in index_manifest.pending(file_name):
+            previous.setdefault(chunk_id, None)
+        return previous
+    existing = collection.get(where={"source": file_name}, include=[])
+    return {chunk_id: None for chunk_id in [*existing["ids"], *index_manifest.pending(file_name)]}
+
+
+def bulk_store_chunks(
+    chunks,
+    file_name: str,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+    progress=None,
+    incremental: bool = INCREMENTAL_INDEXING,
+) -> dict:
+    """
+    Encode les chunks par micro-lots et les écrit dans Chroma par gros lots.
+    L'écriture du lot N se fait dans un thread pendant l'encodage du lot N+1.
+    chunks peut être une liste ou un itérable (str ou (str, métadonnées)) consommé lot par lot.
+    En mode incrémental, les chunks déjà indexés avec le même contenu ne sont pas ré-encodés ;
+    dans tous les cas les chunks de l'ancienne version absents de la nouvelle sont supprimés.
+    progress(done, total) est appelé après chaque lot écrit (total None si inconnu).
+    """
+    started = time.perf_counter()
+    previous = _previous_ids(file_name)
+    manifest = []
+    occurrences = {}
+    pending = None
+    done = added = reused_count = 0
+    total = len(chunks) if isinstance(chunks, list) else None
+
+    # Un seul thread d'écriture : les upserts restent séquentiels et ordonnés
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for start, batch in _batched(chunks, upsert_batch_size):
+            texts = [c[0] if isinstance(c, tuple) else c for c in batch]
+            hashes = [text_hash(t) for t in texts]
+            ids = _chunk_ids(file_name, hashes, occurrences)
+            new = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+            reused = {"ids": [], "metadatas": []}
+            reused_texts = []
+
+            for i, (chunk, chunk_id, h) in enumerate(zip(batch, ids, hashes)):
+                meta = {**(chunk[1] if isinstance(chunk, tuple) else {}), "source": file_name, "chunk_index": start + i}
+                manifest.append((chunk_id, h, start + i))
+                if incremental and previous.get(chunk_id) == h:
+                    reused["ids"].append(chunk_id)
+                    reused["metadatas"].append(meta)
+                    reused_texts.append(texts[i])
+                else:
+                    new["ids"].append(chunk_id)
+                    new["documents"].append(texts[i])
+                    new["metadatas"].append(meta)
+
+            if new["ids"]:
+                new["embeddings"] = embed_text(new["documents"], batch_size=embed_batch_size)
+            added += len(new["ids"])
+            reused_count += len(reused["ids"])
+
+            if pending is not None:
+                done += pending.result()
+                if progress:
+                    progress(done, total)
+            # Enregistrés avant l'écriture : un échec en cours de route ne laisse pas de chunks hors manifeste
+            index_manifest.add_pending(file_name, new["ids"])
+            pending = writer.submit(_write_batch, file_name, new, reused, reused_texts)
+        if pending is not None:
+            done += pending.result()
+            if progress:
+                progress(done, total)
+
+    # Chunks de l'ancienne version qui n'existent plus
+    current = {chunk_id for chunk_id, _, _ in manifest}
+    removed = [chunk_id for chunk_id in previous if chunk_id not in current]
+    for start in range(0, len(removed), upsert_batch_size):
+        collection.delete(ids=removed[start:start + upsert_batch_size])
+    lexical_index.remove_many(removed)
+    index_manifest.replace(file_name, manifest, EMBED_MODEL_KEY)
+
+    elapsed = time.perf_counter() - started
+    count("index", "chunks_added", added)
+    count("index", "chunks_reused", reused_count)
+    count("index", "chunks_removed", len(removed))
+    stats = {
+        "chunks": done,
+        "added": added,
+        "reused": reused_count,
+        "removed": len(removed),
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(done / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    print(f"[INFO] {stats['chunks']} chunks indexés pour {file_name} en {stats['seconds']}s ({stats['chunks_per_sec']} chunks/s) : "
+          f"{added} ajoutés, {reused_count} réutilisés, {len(removed)} supprimés")
+    return stats
+
+
+def store_chunks(chunks, file_name, progress=None):
+    with document_lock(file_name):
+        stats = bulk_store_chunks(chunks, file_name, progress=progress)
+        # Route des recherches limitées au document (matrice en mémoire ou collection dédiée)
+        with stage("index_routing"):
+            stats["route"] = index_router.refresh(file_name, stats["chunks"])
+    # Les réponses en cache pour ce document ne reflètent plus son contenu
+    answer_cache.invalidate(file_name)
+    return stats
@@ -0,0 +1,234 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from rag_engine import extraction_worker
+from rag_engine.extractors import format_group, ingest_limits, is_prechunked, warm_up, warmup_extensions
+from rag_engine.index_manifest import index_manifest
+from rag_engine.ingestion import document_lock, iter_chunks, store_chunks
+from rag_engine.metrics import count, metrics, stage
+from rag_engine.mindmap_extractor import generate_mindmap_from_units
+from rag_engine.spool import new_spool_path, read_units, remove_quietly
+
+# Jobs pouvant avancer en parallèle (découpage, embedding, mindmap)
+INGEST_JOBS = int(os.getenv("RAG_INGEST_JOBS", "4"))
+# Au-delà, les nouveaux jobs sont refusés
+INGEST_MAX_PENDING = int(os.getenv("RAG_INGEST_MAX_PENDING", "100"))
+# Jobs terminés conservés pour /jobs/{id}
+INGEST_KEEP_FINISHED = int(os.getenv("RAG_INGEST_KEEP_FINISHED", "1000"))
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, kind: str, source: str, fmt: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.source = source
+        self.format = fmt
+        self.status = "queued"
+        self.progress = {"extracted": False, "units": 0, "chunks": 0, "embedded": 0, "mindmap": None}
+        # Attente dans la file du format puis durée de chaque étape, en millisecondes
+        self.timings = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "source": self.source,
+            "format": self.format,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "timings": dict(self.timings),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """
+    File de jobs d'ingestion. Chaque famille de formats (RAG_INGEST_LIMITS) a sa propre file
+    d'attente et son propre pool de processus, de la taille de sa limite : une longue vidéo ou
+    un gros PDF n'occupe jamais les processus qui extraient les txt/csv.
+    Une fois extrait, le job passe aux coordinateurs (découpage, embedding, mindmap).
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._limits = ingest_limits()
+        self._extractors = {
+            name: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"extract-{name}")
+            for name, n in self._limits.items()
+        }
+        self._coordinators = ThreadPoolExecutor(max_workers=INGEST_JOBS, thread_name_prefix="ingest")
+        self._pools = {}
+
+    def _group(self, fmt: str) -> str:
+        group = format_group(fmt)
+        return group if group in self._limits else "default"
+
+    def _process_pool(self, group: str) -> ProcessPoolExecutor:
+        with self._lock:
+            if group not in self._pools:
+                # spawn : pas d'héritage des threads ni des connexions du processus API ;
+                # chaque processus précharge les extracteurs et modèles de sa famille (RAG_EXTRACTOR_WARMUP)
+                self._pools[group] = ProcessPoolExecutor(
+                    max_workers=self._limits[group],
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up,
+                    initargs=(warmup_extensions(group),),
+                )
+            return self._pools[group]
+
+    def prestart(self) -> bool:
+        """Démarre en arrière-plan les processus des familles ayant des formats à précharger."""
+        started = False
+        for group, limit in self._limits.items():
+            if warmup_extensions(group):
+                pool = self._process_pool(group)
+                for _ in range(limit):
+                    pool.submit(os.getpid)
+                started = True
+        return started
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self._jobs.get(job_id)
+
+    def submit_upload(self, upload_path: str, file_name: str, extension: str, mime_type: str | None = None) -> IngestionJob:
+        """upload_path : fichier déjà écrit sur disque, supprimé à la fin du job."""
+        job = self._new_job("upload", file_name, extension)
+        self._submit(
+            job, file_name,
+            extraction_worker.extract_upload, (upload_path, extension, mime_type), True, upload_path,
+            is_prechunked(extension, mime_type),
+        )
+        return job
+
+    def submit_url(self, url: str, source_name: str, fmt: str, crawl: dict | None = None) -> IngestionJob:
+        """crawl : options de crawl (max_pages, max_depth), ou None pour une seule page."""
+        job = self._new_job("url", url, fmt)
+        # Pages identiques à celles de la version indexée : rien n'est ré-analysé ni ré-indexé
+        indexed_hash = index_manifest.content_hash(source_name) if index_manifest.has(source_name) else None
+        self._submit(
+            job, source_name,
+            extraction_worker.extract_url, (url, crawl, indexed_hash), False,
+        )
+        return job
+
+    def _new_job(self, kind: str, source: str, fmt: str) -> IngestionJob:
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.finished_at is None)
+            if pending >= INGEST_MAX_PENDING:
+                raise QueueFullError(f"File d'ingestion pleine ({pending} jobs en attente)")
+            job = IngestionJob(kind, source, fmt)
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def _prune(self):
+        finished = sorted(
+            (j for j in self._jobs.values() if j.finished_at is not None),
+            key=lambda j: j.finished_at,
+        )
+        for job in finished[:max(0, len(finished) - INGEST_KEEP_FINISHED)]:
+            del self._jobs[job.id]
+
+    def _submit(self, job: IngestionJob, *run_args):
+        self._extractors[self._group(job.format)].submit(self._extract, job, *run_args)
+
+    def _extract(self, job: IngestionJob, document_name: str, extract, args: tuple, with_mindmap: bool,
+                 upload_path: str | None = None, prechunked: bool = False):
+        # Le texte extrait transite par un fichier JSON lines : ni le worker ni ce thread
+        # ne gardent le document entier en mémoire.
+        # prechunked : les unités sont déjà des chunks (tableaux), indexées sans découpage en tokens
+        spool_path = new_spool_path(".jsonl")
+        try:
+            job.status = "extracting"
+            job.timings["queued_ms"] = round((time.time() - job.created_at) * 1000, 1)
+            pool = self._process_pool(self._group(job.format))
+            started = time.perf_counter()
+            with stage(f"extract_{job.format}"):
+                (units, content_hash), worker_metrics = pool.submit(extract, *args, spool_path).result()
+            metrics.merge(worker_metrics)
+            job.timings["extract_ms"] = _elapsed_ms(started)
+            job.progress["extracted"] = True
+            remove_quietly(upload_path)
+            if units is None:
+                job.result = {"document_name": document_name, "ingestion": None, "unchanged": True}
+                job.status = "done"
+                self._finish(job, spool_path)
+                return
+            job.progress["units"] = units
+            job.status = "extracted"
+        except Exception as e:
+            self._fail(job, e)
+            self._finish(job, upload_path, spool_path)
+            return
+        self._coordinators.submit(self._index, job, document_name, spool_path, with_mindmap, prechunked, content_hash)
+
+    def _index(self, job: IngestionJob, document_name: str, spool_path: str, with_mindmap: bool, prechunked: bool,
+               content_hash: str | None):
+        try:
+            job.status = "embedding"
+            started = time.perf_counter()
+
+            def counted(chunks):
+                for chunk in chunks:
+                    job.progress["chunks"] += 1
+                    yield chunk
+
+            units = read_units(spool_path)
+            # Chunks et empreinte écrits sous le même verrou : un envoi simultané du même document attend
+            with document_lock(document_name), stage("index_document"):
+                stats = store_chunks(
+                    counted(units if prechunked else iter_chunks(units)), document_name,
+                    progress=lambda done, total: job.progress.update(embedded=done),
+                )
+                # Seulement après une indexation réussie : un échec sera retenté au prochain envoi
+                index_manifest.set_content_hash(document_name, content_hash)
+            job.timings["index_ms"] = _elapsed_ms(started)
+            count("chunking", "chunks", job.progress["chunks"])
+
+            if with_mindmap:
+                job.status = "mindmap"
+                job.progress["mindmap"] = False
+                started = time.perf_counter()
+                with stage("mindmap"):
+                    generate_mindmap_from_units(read_units(spool_path), document_name)
+                job.timings["mindmap_ms"] = _elapsed_ms(started)
+                job.progress["mindmap"] = True
+
+            job.result = {"document_name": document_name, "ingestion": stats}
+            job.status = "done"
+        except Exception as e:
+            self._fail(job, e)
+        finally:
+            self._finish(job, spool_path)
+
+    def _fail(self, job: IngestionJob, error: Exception):
+        traceback.print_exc()
+        metrics.inc("rag_ingestion_jobs_failed_total", format=job.format)
+        job.error = str(error)
+        job.status = "failed"
+
+    def _finish(self, job: IngestionJob, *paths):
+        remove_quietly(*paths)
+        job.finished_at = time.time()
+
+ingestion_queue = IngestionQueue()
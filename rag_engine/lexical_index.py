@@ -0,0 +1,172 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+LEXICAL_INDEX_PATH = os.getenv("RAG_LEXICAL_INDEX_PATH", "./lexical_index.sqlite3")
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# Termes présents dans plus de cette fraction des chunks : ils ne font que départager
+# les candidats trouvés par les termes plus rares (au lieu de parcourir toute leur liste)
+COMMON_TERM_RATIO = 0.05
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./][0-9a-z]+)*")
+_STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "ou", "a", "au", "aux", "en", "dans",
+    "par", "pour", "sur", "avec", "ce", "ces", "est", "sont", "qui", "que", "quoi", "quel", "quelle",
+    "il", "elle", "ils", "on", "ne", "pas", "se", "sa", "son", "ses", "l", "d", "qu", "c", "s", "n",
+    "the", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "was", "what",
+    "which", "who", "how", "it", "this", "that", "be", "by", "as", "at", "from",
+}
+
+
+def tokenize(text: str) -> list:
+    """Minuscules sans accents ; les identifiants composés (REF-48213, v2.1) sont gardés entiers et en parties."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in _STOPWORDS)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """Fusionne plusieurs listes d'ids classées : score = somme des 1 / (k + rang)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    """
+    Index inversé BM25 des chunks, maintenu à côté de Chroma par store_chunks.
+    Persisté dans SQLite, interrogé depuis une copie en mémoire (chargée au premier usage).
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._postings = None  # terme → {chunk_id: tf}
+        self._lengths = {}     # chunk_id → nombre de tokens
+        self._sources = {}     # chunk_id → source
+        self._by_source = {}   # source → {chunk_id}
+        self._total_length = 0
+
+    def _load(self):
+        if self._postings is not None:
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, source TEXT, length INTEGER)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT, chunk_id TEXT, tf INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id)")
+        self._conn.commit()
+        self._postings = {}
+        for chunk_id, source, length in self._conn.execute("SELECT chunk_id, source, length FROM chunks"):
+            self._register(chunk_id, source, length)
+        for term, chunk_id, tf in self._conn.execute("SELECT term, chunk_id, tf FROM postings"):
+            self._postings.setdefault(term, {})[chunk_id] = tf
+
+    def _register(self, chunk_id: str, source: str, length: int):
+        self._lengths[chunk_id] = length
+        self._sources[chunk_id] = source
+        self._by_source.setdefault(source, set()).add(chunk_id)
+        self._total_length += length
+
+    def __contains__(self, chunk_id: str) -> bool:
+        with self._lock:
+            self._load()
+            return chunk_id in self._lengths
+
+    def add_many(self, items: list):
+        """items : liste de (chunk_id, source, texte) ; un id déjà présent est remplacé."""
+        if not items:
+            return
+        with self._lock:
+            self._load()
+            self._remove([chunk_id for chunk_id, _, _ in items if chunk_id in self._lengths])
+            chunk_rows, posting_rows = [], []
+            for chunk_id, source, text in items:
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._register(chunk_id, source, length)
+                chunk_rows.append((chunk_id, source, length))
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                    posting_rows.append((term, chunk_id, tf))
+            self._conn.executemany("INSERT INTO chunks (chunk_id, source, length) VALUES (?, ?, ?)", chunk_rows)
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self._conn.commit()
+
+    def remove_many(self, chunk_ids: list):
+        with self._lock:
+            self._load()
+            self._remove([c for c in chunk_ids if c in self._lengths])
+            self._conn.commit()
+
+    def _remove(self, chunk_ids: list):
+        if not chunk_ids:
+            return
+        removed = set(chunk_ids)
+        for chunk_id in removed:
+            self._total_length -= self._lengths.pop(chunk_id)
+            source = self._sources.pop(chunk_id)
+            self._by_source[source].discard(chunk_id)
+            if not self._by_source[source]:
+                del self._by_source[source]
+        for start in range(0, len(chunk_ids), 500):
+            part = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            # Les postings du chunk sont retrouvés via SQLite (index sur chunk_id)
+            rows = self._conn.execute(f"SELECT term, chunk_id FROM postings WHERE chunk_id IN ({placeholders})", part)
+            for term, chunk_id in rows.fetchall():
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(chunk_id, None)
+                    if not posting:
+                        del self._postings[term]
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", part)
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", part)
+
+    def search(self, query: str, n_results: int = 10, source: str | None = None) -> list:
+        """Retourne [(chunk_id, score BM25)] par score décroissant, filtré sur source si fourni."""
+        with self._lock:
+            self._load()
+            n_chunks = len(self._lengths)
+            if not n_chunks:
+                return []
+            allowed = self._by_source.get(source, set()) if source else None
+            if allowed is not None and not allowed:
+                return []
+            avg_length = self._total_length / n_chunks
+            postings = [self._postings[t] for t in set(tokenize(query)) if t in self._postings]
+            postings.sort(key=len)
+            scores = {}
+            for posting in postings:
+                idf = math.log(1 + (n_chunks - len(posting) + 0.5) / (len(posting) + 0.5))
+                if scores and len(posting) > COMMON_TERM_RATIO * n_chunks:
+                    candidates = ((c, posting[c]) for c in list(scores) if c in posting)
+                # Le filtre par document parcourt le plus petit des deux ensembles
+                elif allowed is not None and len(allowed) < len(posting):
+                    candidates = ((c, posting[c]) for c in allowed if c in posting)
+                else:
+                    candidates = ((c, tf) for c, tf in posting.items() if allowed is None or c in allowed)
+                for chunk_id, tf in candidates:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+lexical_index = LexicalIndex()
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import queue
+import threading
+from rag_engine.metrics import metrics
+
+# Backends compatibles OpenAI, séparés par des virgules ; "url@modele1+modele2" limite un backend
+# à certains modèles, sinon les modèles servis sont découverts par le health check (/models)
+LLM_BACKENDS = os.getenv("RAG_LLM_BACKENDS", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"))
+# Générations simultanées par backend, et requêtes en attente au-delà desquelles on refuse
+LLM_MAX_CONCURRENCY = int(os.getenv("RAG_LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("RAG_LLM_MAX_QUEUE", "16"))
+# Attente maximale d'une place libre (secondes)
+LLM_QUEUE_TIMEOUT = float(os.getenv("RAG_LLM_QUEUE_TIMEOUT", "30"))
+LLM_TIMEOUT = float(os.getenv("RAG_LLM_TIMEOUT", "120"))
+# Nouvelles tentatives (sur un autre backend si possible) après une erreur réseau ou 5xx
+LLM_RETRIES = int(os.getenv("RAG_LLM_RETRIES", "2"))
+LLM_HEALTH_INTERVAL = float(os.getenv("RAG_LLM_HEALTH_INTERVAL", "30"))
+
+
+class GatewayOverloadedError(RuntimeError):
+    pass
+
+
+def _parse_backends(spec: str) -> list:
+    backends = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        url, _, models = part.partition("@")
+        backends.append((url.rstrip("/"), {m.strip() for m in models.split("+") if m.strip()}))
+    return backends
+
+
+def _retryable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class Backend:
+    def __init__(self, url: str, models: set, max_concurrency: int, max_queue: int):
+        self.url = url
+        self.models = models
+        # Modèles annoncés par /models (None tant qu'inconnus)
+        self.discovered = None
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self.healthy = True
+        self.last_error = None
+        self._client = None
+        self._slots = None
+
+    def client(self):
+        # Créé dans la boucle du gateway : le pool de connexions httpx y est attaché
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(base_url=self.url, api_key="ollama", timeout=LLM_TIMEOUT, max_retries=0)
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def serves(self, model: str) -> bool:
+        if self.models:
+            return model in self.models
+        return self.discovered is None or model in self.discovered or f"{model}:latest" in self.discovered
+
+    def load(self) -> float:
+        return (self.in_flight + self.waiting) / self.max_concurrency
+
+    async def acquire(self):
+        self.client()
+        if self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue:
+            raise GatewayOverloadedError(f"LLM {self.url} saturé ({self.in_flight} en cours, {self.waiting} en attente)")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise GatewayOverloadedError(f"LLM {self.url} : pas de place libre après {LLM_QUEUE_TIMEOUT}s")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "models": sorted(self.models or self.discovered or []),
+            "last_error": self.last_error,
+        }
+
+
+class LLMGateway:
+    """
+    Clients OpenAI asynchrones partagés (un pool de connexions par backend) dans une boucle
+    d'événements dédiée, avec des façades synchrones pour le reste du code.
+    Chaque requête va au backend sain servant le modèle le moins chargé ; au-delà de
+    max_concurrency générations et max_queue requêtes en attente, la requête est refusée.
+    """
+
+    def __init__(self, backends: str = LLM_BACKENDS, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE, retries: int = LLM_RETRIES,
+                 health_interval: float = LLM_HEALTH_INTERVAL):
+        self.backends = [Backend(url, models, max_concurrency, max_queue) for url, models in _parse_backends(backends)]
+        if not self.backends:
+            raise ValueError("Aucun backend LLM configuré (RAG_LLM_BACKENDS)")
+        self.retries = retries
+        self.health_interval = health_interval
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        # Démarrée au premier appel : les processus d'ingestion n'ouvrent aucune connexion
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                if self.health_interval > 0:
+                    asyncio.run_coroutine_threadsafe(self._health_loop(), loop)
+                self._loop = loop
+            return self._loop
+
+    def _pick(self, model: str, exclude: set) -> Backend:
+        candidates = [b for b in self.backends if b.serves(model) and b not in exclude]
+        if not candidates:
+            candidates = [b for b in self.backends if b not in exclude] or self.backends
+        healthy = [b for b in candidates if b.healthy] or candidates
+        return min(healthy, key=Backend.load)
+
+    async def _with_backend(self, model: str, call, can_retry=lambda: True):
+        """Exécute call(backend) avec une place réservée ; relance sur un autre backend si l'erreur est transitoire."""
+        tried = set()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+            backend = self._pick(model, tried)
+            try:
+                await backend.acquire()
+            except GatewayOverloadedError:
+                metrics.inc("rag_llm_requests_total", backend=backend.url, outcome="shed")
+                raise
+            try:
+                result = await call(backend)
+                backend.healthy, backend.last_error = True, None
+                metrics.inc("rag_llm_requests_total", backend=backend.url, outcome="ok")
+                return result
+            except Exception as e:
+                backend.last_error = str(e)
+                if not _retryable(e) or not can_retry() or attempt == self.retries:
+                    metrics.inc("rag_llm_requests_total", backend=backend.url, outcome="error")
+                    raise
+                backend.healthy = False
+                tried.add(backend)
+                metrics.inc("rag_llm_requests_total", backend=backend.url, outcome="retry")
+                print(f"[WARN] LLM {backend.url} en échec ({e}), nouvelle tentative")
+            finally:
+                backend.release()
+
+    async def _complete(self, model: str, messages: list, max_tokens: int):
+        async def call(backend):
+            return await backend.client().chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens,
+            )
+        return await self._with_backend(model, call)
+
+    async def _stream(self, model: str, messages: list, max_tokens: int, out: queue.Queue, cancelled: threading.Event):
+        emitted = []
+
+        async def call(backend):
+            stream = await backend.client().chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens, stream=True,
+            )
+            async for event in stream:
+                if cancelled.is_set():
+                    await stream.close()
+                    break
+                if event.choices and event.choices[0].delta.content:
+                    emitted.append(True)
+                    out.put(("token", event.choices[0].delta.content))
+        try:
+            # Une fois un token transmis, une erreur n'est plus rejouable (doublons)
+            await self._with_backend(model, call, can_retry=lambda: not emitted)
+            out.put(("done", None))
+        except BaseException as e:
+            out.put(("error", e))
+
+    def complete(self, model: str, messages: list, max_tokens: int = 500):
+        """Réponse complète (objet ChatCompletion) ; GatewayOverloadedError si tous les backends sont saturés."""
+        future = asyncio.run_coroutine_threadsafe(self._complete(model, messages, max_tokens), self._event_loop())
+        return future.result()
+
+    def stream(self, model: str, messages: list, max_tokens: int = 500):
+        """Tokens au fil de l'eau ; la génération est interrompue si le consommateur s'arrête."""
+        out, cancelled = queue.Queue(), threading.Event()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream(model, messages, max_tokens, out, cancelled), self._event_loop()
+        )
+        try:
+            while True:
+                kind, value = out.get()
+                if kind == "token":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            cancelled.set()
+            future.cancel()
+
+    async def _check(self, backend: Backend):
+        try:
+            models = await asyncio.wait_for(backend.client().models.list(), 5)
+            backend.discovered = {m.id for m in models.data}
+            backend.healthy = True
+        except Exception as e:
+            if backend.healthy:
+                print(f"[WARN] LLM {backend.url} injoignable ({e})")
+            backend.healthy, backend.last_error = False, str(e)
+
+    async def _health_loop(self):
+        while True:
+            await self._check_all()
+            await asyncio.sleep(self.health_interval)
+
+    async def _check_all(self):
+        await asyncio.gather(*(self._check(b) for b in self.backends))
+
+    def health(self) -> list:
+        """Vérifie tous les backends maintenant et retourne leur état."""
+        asyncio.run_coroutine_threadsafe(self._check_all(), self._event_loop()).result()
+        return self.stats()
+
+    def stats(self) -> list:
+        return [b.stats() for b in self.backends]
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,169 @@
+import html
+import json
+import os
+from pathlib import Path
+from string import Template
+
+# Versions des bibliothèques utilisées par markmap-cli
+D3_URL = "https://cdn.jsdelivr.net/npm/d3@7.8.5/dist/d3.min.js"
+MARKMAP_VIEW_URL = "https://cdn.jsdelivr.net/npm/markmap-view@0.15.4/dist/browser/index.js"
+MARKMAP_TOOLBAR_URL = "https://cdn.jsdelivr.net/npm/markmap-toolbar@0.15.4/dist/index.js"
+MARKMAP_TOOLBAR_CSS_URL = "https://cdn.jsdelivr.net/npm/markmap-toolbar@0.15.4/dist/style.css"
+
+# Copie locale des assets (d3.min.js, markmap-view.js, markmap-toolbar.js, markmap-toolbar.css),
+# installée au démarrage de l'API (install_assets) : servie une seule fois via /mindmaps/_assets,
+# ou intégrée dans chaque fichier si MARKMAP_INLINE=1. Le CDN ne sert qu'à défaut d'installation.
+MARKMAP_ASSETS_DIR = os.getenv("RAG_MARKMAP_ASSETS_DIR", "mindmaps/_assets")
+MARKMAP_ASSETS_URL = os.getenv("RAG_MARKMAP_ASSETS_URL", "/mindmaps/_assets")
+MARKMAP_INLINE = os.getenv("RAG_MARKMAP_INLINE", "0") == "1"
+# Délai de téléchargement de chaque asset à l'installation (secondes)
+MARKMAP_ASSETS_TIMEOUT = float(os.getenv("RAG_MARKMAP_ASSETS_TIMEOUT", "20"))
+
+_ASSETS = [
+    ("d3.min.js", D3_URL),
+    ("markmap-view.js", MARKMAP_VIEW_URL),
+    ("markmap-toolbar.js", MARKMAP_TOOLBAR_URL),
+]
+_CSS = ("markmap-toolbar.css", MARKMAP_TOOLBAR_CSS_URL)
+
+_PAGE = Template("""<!doctype html>
+<html>
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<meta http-equiv="X-UA-Compatible" content="ie=edge">
+<title>$title</title>
+<style>
+* {
+  margin: 0;
+  padding: 0;
+}
+#mindmap {
+  display: block;
+  width: 100vw;
+  height: 100vh;
+}
+</style>
+$styles
+</head>
+<body>
+<svg id="mindmap"></svg>
+$scripts<script>(r => {
+  setTimeout(r);
+})(() => {
+  const {
+    markmap,
+    mm
+  } = window;
+  const {
+    el
+  } = markmap.Toolbar.create(mm);
+  el.setAttribute('style', 'position:absolute;bottom:20px;right:20px');
+  document.body.append(el);
+})</script><script>((getMarkmap, getOptions, root2, jsonOptions) => {
+  const markmap = getMarkmap();
+  window.mm = markmap.Markmap.create("svg#mindmap", (getOptions || markmap.deriveOptions)(jsonOptions), root2);
+})(() => window.markmap,null,$root,null)</script>
+</body>
+</html>
+""")
+
+_assets_html = None
+
+
+def install_assets(timeout: float = MARKMAP_ASSETS_TIMEOUT) -> bool:
+    """
+    Télécharge les assets manquants dans MARKMAP_ASSETS_DIR (une seule fois, fichiers écrits
+    puis renommés). Appelé au démarrage de l'API ; retourne False si l'installation échoue.
+    """
+    global _assets_html
+    local = Path(MARKMAP_ASSETS_DIR)
+    missing = [(name, url) for name, url in _ASSETS + [_CSS] if not (local / name).exists()]
+    if missing:
+        import requests
+        try:
+            local.mkdir(parents=True, exist_ok=True)
+            for name, url in missing:
+                response = requests.get(url, timeout=timeout)
+                response.raise_for_status()
+                partial = local / f"{name}.{os.getpid()}.tmp"
+                partial.write_bytes(response.content)
+                os.replace(partial, local / name)
+        except Exception as e:
+            print(f"[WARN] Assets Markmap non installés dans {local} : {e}")
+            return False
+        print(f"[INFO] Assets Markmap installés dans {local} ({len(missing)} fichiers)")
+    # Les cartes suivantes utilisent la copie locale
+    _assets_html = None
+    return True
+
+
+def _asset_tags() -> tuple:
+    """Balises <link>/<script> calculées une seule fois pour tout le processus (et après install_assets)."""
+    global _assets_html
+    if _assets_html is None:
+        local = Path(MARKMAP_ASSETS_DIR)
+        css = local / _CSS[0]
+        have_local = all((local / name).exists() for name, _ in _ASSETS + [_CSS])
+        if have_local and MARKMAP_INLINE:
+            scripts = "".join(f"<script>{(local / name).read_text(encoding='utf-8')}</script>" for name, _ in _ASSETS)
+            styles = f"<style>{css.read_text(encoding='utf-8')}</style>"
+        elif have_local:
+            scripts = "".join(f'<script src="{MARKMAP_ASSETS_URL}/{name}"></script>' for name, _ in _ASSETS)
+            styles = f'<link rel="stylesheet" href="{MARKMAP_ASSETS_URL}/{_CSS[0]}">'
+        else:
+            print(f"[WARN] Assets Markmap absents de {local} : les cartes chargent d3 et markmap depuis le CDN")
+            scripts = "".join(f'<script src="{url}"></script>' for _, url in _ASSETS)
+            styles = f'<link rel="stylesheet" href="{MARKMAP_TOOLBAR_CSS_URL}">'
+        _assets_html = (styles, scripts)
+    return _assets_html
+
+
+def parse_headings(markdown_text: str) -> dict:
+    """
+    Construit l'arbre Markmap (même structure que markmap-lib) à partir des titres Markdown.
+    Un titre # unique devient la racine ; sinon la racine est vide et porte les titres de niveau 1.
+    """
+    root = {"type": "heading", "depth": 0, "payload": {"lines": [0, 0]}, "content": "", "children": []}
+    stack = [(0, root)]
+    for line_number, line in enumerate(markdown_text.splitlines()):
+        stripped = line.strip()
+        level = len(stripped) - len(stripped.lstrip("#"))
+        heading = stripped[level:].strip()
+        if not level or not heading:
+            continue
+        while stack[-1][0] >= level:
+            stack.pop()
+        node = {
+            "type": "heading",
+            "depth": len(stack),
+            "payload": {"lines": [line_number, line_number + 1]},
+            "content": html.escape(heading, quote=False),
+            "children": [],
+        }
+        stack[-1][1]["children"].append(node)
+        stack.append((level, node))
+
+    if len(root["children"]) == 1:
+        root = root["children"][0]
+        _shift_depth(root, -root["depth"])
+    return root
+
+
+def _shift_depth(node: dict, delta: int):
+    node["depth"] += delta
+    for child in node["children"]:
+        _shift_depth(child, delta)
+
+
+def render_markmap_html(markdown_text: str, title: str = "Markmap") -> str:
+    styles, scripts = _asset_tags()
+    # "</" est échappé pour ne pas fermer la balise <script> depuis le contenu
+    root = json.dumps(parse_headings(markdown_text), ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return _PAGE.substitute(title=html.escape(title), styles=styles, scripts=scripts, root=root)
+
+
+def render_markmap_file(md_file: str, output_html: str, title: str = "Markmap"):
+    markdown_text = Path(md_file).read_text(encoding="utf-8")
+    Path(output_html).write_text(render_markmap_html(markdown_text, title), encoding="utf-8")
+
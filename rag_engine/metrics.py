@@ -0,0 +1,156 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Ajoute l'en-tête Server-Timing (durée par étape) aux réponses HTTP
+SERVER_TIMING = os.getenv("RAG_SERVER_TIMING", "0") == "1"
+# Bornes des histogrammes de durée, en secondes
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Durées par étape de la requête HTTP en cours (dict partagé avec les threads qu'elle lance)
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+class Metrics:
+    """
+    Compteurs et histogrammes en mémoire, au format texte Prometheus.
+    Les processus d'extraction renvoient leurs mesures avec drain() ; le processus API les fusionne avec merge().
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def drain(self) -> dict:
+        """Retourne les mesures accumulées et les remet à zéro."""
+        with self._lock:
+            snapshot = {"counters": self._counters, "histograms": self._histograms}
+            self._counters, self._histograms = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict | None):
+        if not snapshot:
+            return
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, total, n) in snapshot["histograms"].items():
+                histogram = self._histograms.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+                histogram[2] += n
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus 0.0.4."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._histograms.items())
+
+        lines, declared = [], set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), (counts, total, n) in histograms:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Mesure une étape : histogramme rag_stage_duration_seconds, compteur rag_stage_errors_total
+    en cas d'exception, et durée ajoutée au détail de la requête HTTP en cours.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        metrics.inc("rag_stage_errors_total", stage=name, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("rag_stage_duration_seconds", elapsed, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def timed(name: str):
+    """Décorateur : la fonction entière est mesurée comme l'étape `name`."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, item: str, value: float = 1):
+    """Éléments traités par une étape (pages, images, chunks, tokens…) : rag_items_total."""
+    if value:
+        metrics.inc("rag_items_total", value, stage=name, item=item)
+
+
+def start_request() -> dict:
+    """Ouvre le détail par étape de la requête courante ; retourne le dict à lire en fin de requête."""
+    stages = {}
+    _request_stages.set(stages)
+    return stages
+
+
+def request_stages() -> dict:
+    """Durées (ms) des étapes de la requête courante."""
+    stages = _request_stages.get() or {}
+    return {name: round(seconds * 1000, 1) for name, seconds in stages.items()}
+
+
+def server_timing_header(stages: dict, total_seconds: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
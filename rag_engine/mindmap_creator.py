@@ -1,87 +1,271 @@
-from pathlib import Path
-import subprocess
-import ollama
-from langdetect import detect
-
-class MindMapGenerator:
-    def __init__(self, model: str = "mistral", markmap_js_path: str = "render_markmap_html.cjs"):
-        self.model = model
-        self.markmap_js_path = markmap_js_path
-
-    def create_mindmap(self, text: str, output_md: str = "mindmap.md") -> str:
-        """Génère une carte mentale Markdown à partir d'un texte donné."""
-        md_content = self._generate_markmap_markdown(text)
-        cleaned_md = self.clean_markdown(md_content)
-        md_file = Path(output_md)
-        md_file.write_text(cleaned_md.strip(), encoding="utf-8")
-        print(f"[INFO] Markdown mind map saved to: {md_file}")
-        return str(md_file)
-
-    def _generate_markmap_markdown(self, text: str) -> str:
-        """Détecte la langue et construit un prompt adapté pour Ollama."""
-
-        lang = detect(text)
-
-        if lang == "fr":
-            prompt = f"""
-Tu es un expert en mind mapping. Tu vas lire un texte en français, qu’il soit structuré ou non, et en générer une carte mentale visuelle et hiérarchique au format Markdown.
-
-Objectif :
-- Si le texte est un paragraphe unifié, identifie un thème central et génère au moins 3 idées principales, chacune avec des sous-idées.
-- Si le texte contient déjà des titres, utilise-les pour structurer la carte.
-- Représente les concepts sous forme de brainstorming organisé comme dans une carte mentale.
-- Utilise uniquement des en-têtes Markdown : # (thème central), ## (branches principales), ### (sous-idées).
-
-Ne reformule pas et ne donne pas d'interprétation personnelle.
-
-Exemple :
-# Thème central
-## Idée 1
-### Détail 1.1
-### Détail 1.2
-## Idée 2
-### ...
-Voici le texte :
-{text}
-"""
-        else:
-            prompt = f"""
-You are a mind map expert. You will be given a text (structured or a single paragraph). Your task is to extract the central theme and generate a brainstorming-style hierarchical mind map in Markdown.
-
-Goal:
-- If it's a single paragraph, extract the main theme and generate 3+ main ideas with sub-ideas.
-- If it has titles, use them to structure the map.
-- Use Markdown headings only: #, ##, ###. Do not return anything else.
-
-Example:
-# Main Topic
-## Idea 1
-### Detail 1.1
-### Detail 1.2
-## Idea 2
-### ...
-Here is the text:
-{text}
-"""
-
-        response = ollama.chat(model=self.model, messages=[{"role": "user", "content": prompt}])
-        return response["message"]["content"]
-
-    def clean_markdown(self, markdown_text: str) -> str:
-        """Nettoie le markdown pour Markmap (enlève les lignes inutiles)."""
-        return "\n".join(
-            line.lstrip()
-            for line in markdown_text.splitlines()
-            if line.strip().startswith("#")
-        )
-
-    def render_html(self, md_file: str, output_html: str = "mindmap.html"):
-        """Génère le HTML interactif via Markmap CLI."""
-        md_path = Path(md_file)
-        if not md_path.exists():
-            raise FileNotFoundError(f"{md_file} not found.")
-
-        subprocess.run(["node", self.markmap_js_path, str(md_path), output_html], check=True)
-        print(f"[INFO] Mind map HTML saved to: {output_html}")
-
-
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+import hashlib
+import os
+import re
+import time
+import ollama
+from langdetect import detect
+from rag_engine.markmap_renderer import render_markmap_file
+from rag_engine.metrics import stage
+
+# Au-delà de cette taille, la carte est construite section par section puis fusionnée
+MINDMAP_SINGLE_PASS_CHARS = int(os.getenv("RAG_MINDMAP_SINGLE_PASS_CHARS", "12000"))
+# Taille visée d'une section envoyée au modèle (une section fait de la moitié au double)
+MINDMAP_SECTION_CHARS = int(os.getenv("RAG_MINDMAP_SECTION_CHARS", "6000"))
+# Sous-cartes au plus par document : au-delà, les sections sont échantillonnées sur tout le document
+MINDMAP_MAX_SECTIONS = int(os.getenv("RAG_MINDMAP_MAX_SECTIONS", "40"))
+# Appels Ollama simultanés en mode hiérarchique
+MINDMAP_CONCURRENCY = int(os.getenv("RAG_MINDMAP_CONCURRENCY", "3"))
+# Sous-cartes par section, hors du dossier servi sous /mindmaps
+MINDMAP_SECTION_CACHE_DIR = os.getenv("RAG_MINDMAP_SECTION_CACHE_DIR", "./mindmap_cache")
+MINDMAP_SECTION_CACHE_MAX_ENTRIES = int(os.getenv("RAG_MINDMAP_SECTION_CACHE_MAX_ENTRIES", "20000"))
+# Âge maximal d'une sous-carte non réutilisée (secondes)
+MINDMAP_SECTION_CACHE_TTL = float(os.getenv("RAG_MINDMAP_SECTION_CACHE_TTL", str(30 * 24 * 3600)))
+# Échantillon utilisé pour détecter la langue
+LANG_SAMPLE_CHARS = 5000
+
+# Marqueurs de structure produits par les extracteurs PPTX et PDF
+_SECTION_MARKER = re.compile(r"(?=<<SLIDE \d+ START>>|\n📄 Page \d+)")
+
+class MindMapGenerator:
+    def __init__(self, model: str = "mistral"):
+        self.model = model
+
+    def create_mindmap(self, units, output_md: str = "mindmap.md", title: str | None = None) -> str:
+        """
+        Génère une carte mentale Markdown à partir d'un texte ou d'unités de texte lues au fil de l'eau :
+        seul le début du document est gardé pour décider entre une passe unique et le mode hiérarchique.
+        """
+        units = iter([units] if isinstance(units, str) else units)
+        head, size = [], 0
+        for unit in units:
+            head.append(unit)
+            size += len(unit) + 1
+            if size > MINDMAP_SINGLE_PASS_CHARS:
+                break
+        if size > MINDMAP_SINGLE_PASS_CHARS:
+            lang = detect("\n".join(head)[:LANG_SAMPLE_CHARS])
+            cleaned_md = self._generate_hierarchical_markdown(chain(head, units), lang, title)
+        else:
+            md_content = self._generate_markmap_markdown("\n".join(head))
+            cleaned_md = self.clean_markdown(md_content)
+        md_file = Path(output_md)
+        md_file.write_text(cleaned_md.strip(), encoding="utf-8")
+        print(f"[INFO] Markdown mind map saved to: {md_file}")
+        return str(md_file)
+
+    def _iter_pieces(self, units):
+        """Morceaux des unités coupés sur les marqueurs de diapositive/page, les trop longs sur les paragraphes."""
+        for unit in units:
+            for part in _SECTION_MARKER.split(unit + "\n"):
+                if len(part) <= MINDMAP_SECTION_CHARS:
+                    yield part
+                    continue
+                current = ""
+                for paragraph in part.split("\n\n"):
+                    if current and len(current) + len(paragraph) > MINDMAP_SECTION_CHARS:
+                        yield current
+                        current = ""
+                    current += paragraph + "\n\n"
+                yield current
+
+    def _ends_section(self, piece: str) -> bool:
+        """
+        Frontière définie par le contenu du morceau seul (page, diapositive, paragraphe) : une
+        modification ne déplace que les frontières voisines, les autres sections restent en cache.
+        Probabilité proportionnelle à la taille du morceau : une section dépasse sa taille minimale
+        de MINDMAP_SECTION_CHARS / 2 en moyenne.
+        """
+        draw = int.from_bytes(hashlib.sha1(piece.encode("utf-8")).digest()[:4], "big") / 2 ** 32
+        return draw < len(piece) / (MINDMAP_SECTION_CHARS / 2)
+
+    def split_sections(self, units):
+        """
+        Découpe le texte (chaîne ou unités) sur les marqueurs de diapositive/page (les trop longues
+        recoupées sur les paragraphes), puis regroupe ces morceaux en sections aux frontières
+        stables : une section se termine, passé MINDMAP_SECTION_CHARS / 2, après un morceau dont le
+        contenu le désigne (_ends_section), et au plus tard à 2 × MINDMAP_SECTION_CHARS.
+        Générateur : seule la section en cours est gardée en mémoire.
+        """
+        if isinstance(units, str):
+            units = [units]
+        current = ""
+        for piece in self._iter_pieces(units):
+            if current and len(current) + len(piece) > 2 * MINDMAP_SECTION_CHARS:
+                if current.strip():
+                    yield current
+                current = ""
+            current += piece
+            if len(current) >= MINDMAP_SECTION_CHARS // 2 and self._ends_section(piece):
+                if current.strip():
+                    yield current
+                current = ""
+        if current.strip():
+            yield current
+
+    def _generate_hierarchical_markdown(self, units, lang: str, title: str | None = None) -> str:
+        """
+        Map-reduce : une sous-carte par section (en parallèle, avec cache), puis fusion.
+        Au plus MINDMAP_MAX_SECTIONS sous-cartes : quand la limite est atteinte, une section sur
+        deux est abandonnée et le pas double, l'échantillon reste réparti sur tout le document.
+        Seules les sections retenues (au plus MINDMAP_MAX_SECTIONS) sont gardées en mémoire.
+        """
+        sections, stride = [], 1  # sections : (numéro, texte)
+        for index, section in enumerate(self.split_sections(units)):
+            if index % stride:
+                continue
+            if len(sections) >= MINDMAP_MAX_SECTIONS:
+                stride *= 2
+                sections = [(kept, text) for kept, text in sections if kept % stride == 0]
+                if index % stride:
+                    continue
+            sections.append((index, section))
+        with ThreadPoolExecutor(max_workers=MINDMAP_CONCURRENCY) as pool:
+            sub_maps = list(pool.map(lambda item: self._section_markdown(item[1], lang), sections))
+        sampled = f" (une section sur {stride})" if stride > 1 else ""
+        print(f"[INFO] Mind map hiérarchique : {len(sub_maps)} sections fusionnées{sampled}")
+        self._prune_section_cache()
+        return self.merge_markdown(sub_maps, title)
+
+    def _section_markdown(self, section: str, lang: str) -> str:
+        """Sous-carte d'une section ; mise en cache sur disque par (modèle, langue, contenu)."""
+        key = hashlib.sha256(f"{self.model}|{lang}|{section}".encode("utf-8")).hexdigest()
+        cache_file = Path(MINDMAP_SECTION_CACHE_DIR) / f"{key}.md"
+        try:
+            cached = cache_file.read_text(encoding="utf-8")
+            # Date de modification = dernier usage : l'éviction retire les moins récemment utilisées
+            os.utime(cache_file)
+            return cached
+        except FileNotFoundError:
+            pass
+        cleaned_md = self.clean_markdown(self._generate_markmap_markdown(section, lang))
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(cleaned_md, encoding="utf-8")
+        return cleaned_md
+
+    def _prune_section_cache(self):
+        """Retire les sous-cartes plus vieilles que le TTL, puis les plus anciennes au-delà du nombre maximal."""
+        now = time.time()
+        entries = []
+        for cache_file in Path(MINDMAP_SECTION_CACHE_DIR).glob("*.md"):
+            try:
+                mtime = cache_file.stat().st_mtime
+                if now - mtime > MINDMAP_SECTION_CACHE_TTL:
+                    cache_file.unlink()
+                else:
+                    entries.append((mtime, cache_file))
+            except FileNotFoundError:
+                continue
+        if len(entries) > MINDMAP_SECTION_CACHE_MAX_ENTRIES:
+            entries.sort()
+            for _, cache_file in entries[:len(entries) - MINDMAP_SECTION_CACHE_MAX_ENTRIES]:
+                cache_file.unlink(missing_ok=True)
+
+    def merge_markdown(self, sub_maps: list, title: str | None = None) -> str:
+        """
+        Fusionne les sous-cartes en un seul arbre #/##/###/#### : le thème de chaque section
+        devient une branche ##, ses idées principales des sous-idées ### et leurs détails des
+        feuilles ####. La profondeur est limitée à quatre niveaux : les titres plus profonds
+        (hors consigne du prompt) sont rattachés comme détails.
+        Les branches et idées de même titre sont regroupées.
+        """
+        branches = {}
+        root = title
+        for sub_map in sub_maps:
+            branch = idea = None
+            for line in sub_map.splitlines():
+                level = len(line) - len(line.lstrip("#"))
+                heading = line[level:].strip()
+                if not heading:
+                    continue
+                if level == 1:
+                    root = root or heading
+                    branch, idea = branches.setdefault(heading, {}), None
+                elif branch is None:
+                    # Sous-carte sans thème : sa première entrée sert de branche
+                    branch = branches.setdefault(heading, {})
+                elif level == 2 or idea is None:
+                    idea = heading
+                    branch.setdefault(idea, [])
+                elif heading not in branch[idea]:
+                    branch[idea].append(heading)
+
+        lines = [f"# {root or 'Mind map'}"]
+        for branch, ideas in branches.items():
+            lines.append(f"## {branch}")
+            for idea, details in ideas.items():
+                lines.append(f"### {idea}")
+                lines.extend(f"#### {detail}" for detail in details)
+        return "\n".join(lines)
+
+    def _generate_markmap_markdown(self, text: str, lang: str | None = None) -> str:
+        """Détecte la langue et construit un prompt adapté pour Ollama."""
+
+        lang = lang or detect(text[:LANG_SAMPLE_CHARS])
+
+        if lang == "fr":
+            prompt = f"""
+Tu es un expert en mind mapping. Tu vas lire un texte en français, qu’il soit structuré ou non, et en générer une carte mentale visuelle et hiérarchique au format Markdown.
+
+Objectif :
+- Si le texte est un paragraphe unifié, identifie un thème central et génère au moins 3 idées principales, chacune avec des sous-idées.
+- Si le texte contient déjà des titres, utilise-les pour structurer la carte.
+- Représente les concepts sous forme de brainstorming organisé comme dans une carte mentale.
+- Utilise uniquement des en-têtes Markdown : # (thème central), ## (branches principales), ### (sous-idées).
+
+Ne reformule pas et ne donne pas d'interprétation personnelle.
+
+Exemple :
+# Thème central
+## Idée 1
+### Détail 1.1
+### Détail 1.2
+## Idée 2
+### ...
+Voici le texte :
+{text}
+"""
+        else:
+            prompt = f"""
+You are a mind map expert. You will be given a text (structured or a single paragraph). Your task is to extract the central theme and generate a brainstorming-style hierarchical mind map in Markdown.
+
+Goal:
+- If it's a single paragraph, extract the main theme and generate 3+ main ideas with sub-ideas.
+- If it has titles, use them to structure the map.
+- Use Markdown headings only: #, ##, ###. Do not return anything else.
+
+Example:
+# Main Topic
+## Idea 1
+### Detail 1.1
+### Detail 1.2
+## Idea 2
+### ...
+Here is the text:
+{text}
+"""
+
+        with stage("mindmap_llm"):
+            response = ollama.chat(model=self.model, messages=[{"role": "user", "content": prompt}])
+        return response["message"]["content"]
+
+    def clean_markdown(self, markdown_text: str) -> str:
+        """Nettoie le markdown pour Markmap (enlève les lignes inutiles)."""
+        return "\n".join(
+            line.lstrip()
+            for line in markdown_text.splitlines()
+            if line.strip().startswith("#")
+        )
+
+    def render_html(self, md_file: str, output_html: str = "mindmap.html"):
+        """Génère le HTML interactif Markmap (rendu Python, sans Node ni markmap-cli)."""
+        md_path = Path(md_file)
+        if not md_path.exists():
+            raise FileNotFoundError(f"{md_file} not found.")
+
+        render_markmap_file(str(md_path), output_html)
+        print(f"[INFO] Mind map HTML saved to: {output_html}")
+
+
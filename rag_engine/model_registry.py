@@ -0,0 +1,175 @@
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Durée d'inactivité avant déchargement d'un modèle (0 = jamais)
+MODEL_IDLE_SECONDS = float(os.getenv("RAG_MODEL_IDLE_SECONDS", "1800"))
+# Mémoire maximale occupée par les modèles résidents (0 = illimitée)
+MODEL_MAX_MEMORY_MB = float(os.getenv("RAG_MODEL_MAX_MEMORY_MB", "0"))
+
+
+def estimate_memory_mb(obj) -> float:
+    """Estime la mémoire des paramètres et buffers torch d'un modèle (ou d'un tuple de modèles)."""
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_memory_mb(o) for o in obj)
+    if hasattr(obj, "memory_mb"):
+        # Modèles hors torch (session ONNX…) : taille déclarée par le modèle
+        return obj.memory_mb
+    total = 0
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        total += sum(p.numel() * p.element_size() for p in obj.parameters())
+        total += sum(b.numel() * b.element_size() for b in obj.buffers())
+    return total / (1024 * 1024)
+
+
+class _Entry:
+    def __init__(self, loader, exclusive: bool):
+        self.loader = loader
+        self.exclusive = exclusive
+        self.model = None
+        self.memory_mb = 0.0
+        self.loaded_at = None
+        self.last_used = 0.0
+        self.in_use = 0
+        self.load_lock = threading.Lock()
+        self.use_lock = threading.RLock()
+
+
+class ModelRegistry:
+    """
+    Registre de modèles partagé par tout le processus.
+    Chaque modèle est chargé au premier usage, puis déchargé après inactivité
+    ou lorsque le plafond mémoire est dépassé (du moins récemment utilisé au plus récent).
+    """
+
+    def __init__(self, idle_seconds: float = MODEL_IDLE_SECONDS, max_memory_mb: float = MODEL_MAX_MEMORY_MB):
+        self.idle_seconds = idle_seconds
+        self.max_memory_mb = max_memory_mb
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._janitor = None
+
+    def register(self, name: str, loader, exclusive: bool = False):
+        """Déclare un modèle. exclusive=True sérialise les accès (modèles non réentrants)."""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader, exclusive)
+
+    def get(self, name: str):
+        """Retourne le modèle, en le chargeant si nécessaire."""
+        entry = self._entries[name]
+        # entry.model n'est lu et modifié que sous self._lock, comme in_use : une éviction
+        # concurrente ne peut pas faire renvoyer None
+        with self._lock:
+            model = entry.model
+            entry.last_used = time.time()
+        if model is not None:
+            return model
+        loaded = False
+        with entry.load_lock:
+            with self._lock:
+                model = entry.model
+            if model is None:
+                started = time.perf_counter()
+                model = entry.loader()
+                memory_mb = estimate_memory_mb(model)
+                with self._lock:
+                    entry.model = model
+                    entry.memory_mb = memory_mb
+                    entry.loaded_at = entry.last_used = time.time()
+                loaded = True
+                print(f"[INFO] Modèle {name} chargé en {time.perf_counter() - started:.1f}s ({memory_mb:.0f} Mo)")
+        if loaded:
+            # Hors load_lock : deux chargements simultanés ne s'attendent pas pour s'évincer
+            self._enforce_memory_cap(keep=name)
+            self._start_janitor()
+        return model
+
+    @contextmanager
+    def use(self, name: str):
+        """Emprunte un modèle : il ne peut pas être déchargé pendant l'utilisation."""
+        entry = self._entries[name]
+        with self._lock:
+            entry.in_use += 1
+        try:
+            if entry.exclusive:
+                with entry.use_lock:
+                    yield self.get(name)
+            else:
+                yield self.get(name)
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+            entry.last_used = time.time()
+
+    def evict(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with entry.load_lock, self._lock:
+            if entry.in_use or entry.model is None:
+                return False
+            model, entry.model = entry.model, None
+            entry.memory_mb = 0.0
+            entry.loaded_at = None
+        # Ressources hors mémoire Python (pool de processus…) libérées explicitement
+        if hasattr(model, "close"):
+            model.close()
+        del model
+        gc.collect()
+        print(f"[INFO] Modèle {name} déchargé")
+        return True
+
+    def resident(self) -> list:
+        """Liste les modèles actuellement chargés avec leur mémoire estimée."""
+        now = time.time()
+        return [
+            {
+                "name": name,
+                "memory_mb": round(entry.memory_mb, 1),
+                "in_use": entry.in_use,
+                "idle_seconds": round(now - entry.last_used, 1),
+            }
+            for name, entry in list(self._entries.items())
+            if entry.model is not None
+        ]
+
+    def _enforce_memory_cap(self, keep: str | None = None):
+        if self.max_memory_mb <= 0:
+            return
+        loaded = sorted(
+            ((n, e) for n, e in self._entries.items() if e.model is not None),
+            key=lambda item: item[1].last_used,
+        )
+        total = sum(e.memory_mb for _, e in loaded)
+        for name, entry in loaded:
+            if total <= self.max_memory_mb:
+                break
+            memory_mb = entry.memory_mb
+            if name != keep and self.evict(name):
+                total -= memory_mb
+
+    def _evict_idle(self):
+        if self.idle_seconds <= 0:
+            return
+        now = time.time()
+        for name, entry in list(self._entries.items()):
+            if entry.model is not None and now - entry.last_used > self.idle_seconds:
+                self.evict(name)
+
+    def _start_janitor(self):
+        if self._janitor is not None or self.idle_seconds <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(min(self.idle_seconds, 60))
+                self._evict_idle()
+
+        self._janitor = threading.Thread(target=run, name="model-registry-janitor", daemon=True)
+        self._janitor.start()
+
+
+registry = ModelRegistry()
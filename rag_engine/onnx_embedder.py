@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Modèles exportés (ONNX fp32, ONNX int8, tokenizer), un sous-dossier par modèle
+EMBED_ONNX_DIR = os.getenv("RAG_EMBED_ONNX_DIR", "./onnx_models")
+
+
+def _model_dir(model_name: str) -> str:
+    return os.path.join(EMBED_ONNX_DIR, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, directory: str):
+    """
+    Exporte le transformer du modèle sentence-transformers en ONNX (axes batch et séquence
+    dynamiques), puis une version quantifiée int8 (quantification dynamique des poids).
+    Le tokenizer et la longueur maximale sont sauvegardés à côté : torch n'est plus nécessaire ensuite.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    started = time.perf_counter()
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    model = transformer.auto_model.eval()
+    os.makedirs(directory, exist_ok=True)
+    # Noms temporaires propres au processus, puis os.replace : pas de fichier à moitié écrit
+    suffix = f".{os.getpid()}.tmp"
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model.int8.onnx")
+
+    sample = transformer.tokenizer(["exemple de phrase"], return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (sample["input_ids"], sample["attention_mask"]), fp32_path + suffix,
+            input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "last_hidden_state": axes},
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path + suffix, int8_path + suffix, weight_type=QuantType.QInt8)
+
+    transformer.tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, "embedder.json"), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "max_seq_length": st_model.max_seq_length}, f)
+    os.replace(fp32_path + suffix, fp32_path)
+    os.replace(int8_path + suffix, int8_path)
+    print(f"[INFO] Modèle {model_name} exporté en ONNX (fp32 et int8) en {time.perf_counter() - started:.1f}s")
+
+
+class OnnxEmbedder:
+    """
+    Encodeur ONNX Runtime équivalent au SentenceTransformer (mean pooling sur le masque) :
+    même interface encode(), résultats en numpy float32.
+    """
+
+    def __init__(self, model_path: str, tokenizer_dir: str, max_seq_length: int, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Parallélisme à l'intérieur des opérateurs uniquement : un lot à la fois par session
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+        self.max_seq_length = max_seq_length
+        # Utilisé par le registre de modèles pour le plafond mémoire
+        self.memory_mb = os.path.getsize(model_path) / (1024 * 1024)
+        self._input_names = [i.name for i in self.session.get_inputs()]
+        # Les tokenizers rapides refusent les appels concurrents ("Already borrowed")
+        self._tokenizer_lock = threading.Lock()
+
+    def encode(self, texts: list, batch_size: int = 32) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # Textes triés par longueur : moins de padding dans chaque lot
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            with self._tokenizer_lock:
+                encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                         max_length=self.max_seq_length, return_tensors="np")
+            hidden = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self._input_names})[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            parts.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        vectors = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(parts)
+        return vectors
+
+
+def load_onnx_embedder(model_name: str, quantized: bool = True, threads: int = 0) -> OnnxEmbedder:
+    """Charge la session ONNX du modèle, en l'exportant au premier usage."""
+    directory = _model_dir(model_name)
+    model_path = os.path.join(directory, "model.int8.onnx" if quantized else "model.onnx")
+    if not os.path.exists(model_path) or not os.path.exists(os.path.join(directory, "embedder.json")):
+        export_onnx(model_name, directory)
+    with open(os.path.join(directory, "embedder.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    return OnnxEmbedder(model_path, directory, config["max_seq_length"], threads)
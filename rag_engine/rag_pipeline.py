@@ -1,76 +1,185 @@
-from rag_engine.embedder import embed_text
-from rag_engine.document_indexer import collection
-from openai import OpenAI
-import cohere
-
-# Initialise le client Cohere
-co = cohere.ClientV2("enter your password cohere API")
-
-def get_rag_answer(question: str, model_name: str, document_name: str | None = None) -> str:
-    
-
-    """
-    Génère une réponse en utilisant RAG avec ChromaDB + rerank + Ollama
-    """
-
-    query_embedding = embed_text([question])
-    
-
-    # ✅ Filtrer uniquement les chunks du document si fourni
-    if document_name:
-        results = collection.query(
-            query_embeddings=query_embedding,
-            n_results=5,
-            where={"source": document_name}
-        )
-    else:
-        results = collection.query(
-            query_embeddings=query_embedding,
-            n_results=5
-        )
-
-    docs = results["documents"][0] if results["documents"] else []
-
-    if not docs:
-        return "Aucun contenu pertinent trouvé."
-
-    # 🔁 Rerank avec Cohere
-    reranked = co.rerank(
-        model="rerank-v3.5",
-        query=question,
-        documents=docs,
-        top_n=3
-    )
-    top_chunks = [docs[r.index] for r in reranked.results]
-
-    # 🔮 Génération avec Ollama (compatible OpenAI API)
-    client = OpenAI(base_url="http://localhost:11434/v1", api_key=model_name)
-    messages = [
-        {"role": "system", "content": "Tu es un assistant intelligent qui répond uniquement avec les documents fournis."},
-        {"role": "user", "content": question + "\n\n" + "\n".join(top_chunks)}
-    ]
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        max_tokens=500
-    )
-
-    return response.choices[0].message.content
-
-
-def get_open_answer(prompt: str, model_name: str) -> str:
-    """
-    Génère une réponse libre sans contexte document
-    """
-    client = OpenAI(base_url="http://localhost:11434/v1", api_key=model_name)
-    messages = [
-        {"role": "system", "content": "Tu es un assistant utile et concis."},
-        {"role": "user", "content": prompt}
-    ]
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        max_tokens=500
-    )
-
-    return response.choices[0].message.content
+import os
+import time
+from rag_engine.embedder import embed_text
+from rag_engine.document_indexer import collection
+from rag_engine.index_router import index_router
+from rag_engine.reranker import rerank
+from rag_engine.answer_cache import answer_cache
+from rag_engine.lexical_index import lexical_index, reciprocal_rank_fusion
+from rag_engine.metrics import count, metrics, stage
+from rag_engine.llm_gateway import llm_gateway
+from rag_engine.context_packing import pack_context
+
+# Recherche hybride : BM25 + vecteurs fusionnés par rang réciproque (RRF)
+HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "1") == "1"
+# Candidats demandés à chaque méthode avant fusion, puis candidats transmis au rerank
+RETRIEVAL_CANDIDATES = int(os.getenv("RAG_RETRIEVAL_CANDIDATES", "10"))
+RERANK_CANDIDATES = 5
+
+RAG_SYSTEM_PROMPT = "Tu es un assistant intelligent qui répond uniquement avec les documents fournis."
+OPEN_SYSTEM_PROMPT = "Tu es un assistant utile et concis."
+NO_CONTEXT_ANSWER = "Aucun contenu pertinent trouvé."
+
+
+def retrieve_context(question: str, document_name: str | None = None, query_embedding=None,
+                     report: dict | None = None) -> list:
+    """
+    Recherche vectorielle dans ChromaDB (+ BM25 si hybride) puis rerank (Cohere ou local).
+    Retourne les passages du contexte : chunks voisins fusionnés, dans la limite du budget de tokens.
+    report reçoit le bilan du packing (tokens envoyés, économisés…).
+    """
+    if query_embedding is None:
+        query_embedding = embed_text([question])
+
+
+    n_results = RETRIEVAL_CANDIDATES if HYBRID_RETRIEVAL else RERANK_CANDIDATES
+
+    # ✅ Limité au document si fourni : matrice en mémoire ou collection dédiée, sans filtrer l'index global
+    with stage("vector_search"):
+        results = index_router.query(query_embedding, n_results, document_name)
+
+    docs = results["documents"][0] if results["documents"] else []
+    ids = results["ids"][0] if results["ids"] else []
+    metadatas = results["metadatas"][0] if results.get("metadatas") else [None] * len(ids)
+
+    # 🔤 Fusion avec l'index lexical (identifiants, codes, noms exacts)
+    if HYBRID_RETRIEVAL:
+        with stage("lexical_search"):
+            lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(question, n_results, document_name)]
+        fused = reciprocal_rank_fusion([ids, lexical_ids])[:RERANK_CANDIDATES]
+        texts = dict(zip(ids, docs))
+        metas = dict(zip(ids, metadatas))
+        missing = [chunk_id for chunk_id in fused if chunk_id not in texts]
+        if missing:
+            with stage("fetch_chunks"):
+                fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+            texts.update(zip(fetched["ids"], fetched["documents"]))
+            metas.update(zip(fetched["ids"], fetched["metadatas"]))
+        ids = [chunk_id for chunk_id in fused if chunk_id in texts]
+        docs = [texts[chunk_id] for chunk_id in ids]
+        metadatas = [metas[chunk_id] for chunk_id in ids]
+
+    if not docs:
+        return []
+
+    # 🔁 Rerank (backend choisi par RAG_RERANKER, repli sur l'ordre vectoriel) de tous les candidats :
+    # le budget de tokens décide ensuite combien en garder
+    with stage("rerank"):
+        order = rerank(question, docs, ids, top_n=len(docs))
+
+    # 📦 Fusion des chunks voisins (sans leur chevauchement), ordre du document, budget de tokens
+    with stage("context_packing"):
+        passages, packing = pack_context([(ids[i], docs[i], metadatas[i]) for i in order])
+    count("context_packing", "context_tokens", packing["context_tokens"])
+    count("context_packing", "tokens_saved", packing["tokens_saved"])
+    if report is not None:
+        report.update(packing)
+    return passages
+
+
+def _rag_messages(question: str, top_chunks: list) -> list:
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": question + "\n\n" + "\n\n".join(top_chunks)}
+    ]
+
+
+def _open_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": OPEN_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _complete(model_name: str, messages: list) -> str:
+    with stage("llm_completion"):
+        response = llm_gateway.complete(model_name, messages, max_tokens=500)
+    if response.usage:
+        count("llm", "prompt_tokens", response.usage.prompt_tokens)
+        count("llm", "completion_tokens", response.usage.completion_tokens)
+    return response.choices[0].message.content
+
+
+def _stream_completion(model_name: str, messages: list, timings: dict):
+    """
+    Renvoie les tokens au fur et à mesure qu'Ollama les produit.
+    timings reçoit ttft_ms (premier token) et generation_ms (durée totale).
+    """
+    started = time.perf_counter()
+    tokens = 0
+    with stage("llm_stream"):
+        for token in llm_gateway.stream(model_name, messages, max_tokens=500):
+            if "ttft_ms" not in timings:
+                timings["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                metrics.observe("rag_llm_first_token_seconds", time.perf_counter() - started)
+            tokens += 1
+            yield token
+    count("llm", "stream_chunks", tokens)
+    timings["generation_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def get_rag_answer(question: str, model_name: str, document_name: str | None = None) -> str:
+    """
+    Génère une réponse en utilisant RAG avec ChromaDB + rerank + Ollama
+    """
+    query_embedding = embed_text([question])
+
+    # ♻️ Question déjà posée (ou quasi identique) sur ce document
+    cached = answer_cache.lookup(query_embedding[0], document_name, model_name)
+    if cached is not None:
+        count("answer_cache", "hits")
+        return cached
+
+    started = time.perf_counter()
+    top_chunks = retrieve_context(question, document_name, query_embedding)
+    if not top_chunks:
+        return NO_CONTEXT_ANSWER
+
+    # 🔮 Génération avec Ollama (compatible OpenAI API)
+    answer = _complete(model_name, _rag_messages(question, top_chunks))
+    answer_cache.store(query_embedding[0], document_name, model_name, question, answer, time.perf_counter() - started)
+    return answer
+
+
+def get_open_answer(prompt: str, model_name: str) -> str:
+    """
+    Génère une réponse libre sans contexte document
+    """
+    return _complete(model_name, _open_messages(prompt))
+
+
+def stream_rag_answer(question: str, model_name: str, document_name: str | None, timings: dict):
+    """
+    Version streaming de get_rag_answer : la recherche et le rerank sont faits
+    avant le premier token, timings reçoit retrieval_ms, ttft_ms et generation_ms.
+    """
+    query_embedding = embed_text([question])
+    cached = answer_cache.lookup(query_embedding[0], document_name, model_name)
+    if cached is not None:
+        count("answer_cache", "hits")
+        timings["cache_hit"] = True
+        yield cached
+        return
+
+    started = time.perf_counter()
+    packing = {}
+    top_chunks = retrieve_context(question, document_name, query_embedding, packing)
+    timings["retrieval_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    timings["context_tokens"] = packing.get("context_tokens", 0)
+    timings["tokens_saved"] = packing.get("tokens_saved", 0)
+    if not top_chunks:
+        yield NO_CONTEXT_ANSWER
+        return
+
+    tokens = []
+    for token in _stream_completion(model_name, _rag_messages(question, top_chunks), timings):
+        tokens.append(token)
+        yield token
+    answer_cache.store(query_embedding[0], document_name, model_name, question, "".join(tokens), time.perf_counter() - started)
+
+
+def stream_open_answer(prompt: str, model_name: str, timings: dict):
+    """
+    Version streaming de get_open_answer
+    """
+    yield from _stream_completion(model_name, _open_messages(prompt), timings)
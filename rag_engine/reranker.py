@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import cohere
+from rag_engine.metrics import count
+from rag_engine.model_registry import registry
+
+# Backend de rerank : "cohere", "cross-encoder" (local, CPU) ou "none" (ordre vectoriel)
+RERANKER_BACKEND = os.getenv("RAG_RERANKER", "cohere")
+# Au-delà de ce délai (secondes), on garde l'ordre de la recherche vectorielle
+RERANK_TIMEOUT = float(os.getenv("RAG_RERANK_TIMEOUT", "2.0"))
+CROSS_ENCODER_MODEL = os.getenv("RAG_CROSS_ENCODER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_SCORE_CACHE_SIZE = int(os.getenv("RAG_RERANK_SCORE_CACHE_SIZE", "50000"))
+# API Cohere (surchargeable pour pointer vers un serveur de test)
+COHERE_BASE_URL = os.getenv("COHERE_BASE_URL", "https://api.cohere.com")
+
+
+class Reranker:
+    name = "none"
+
+    def rerank(self, query: str, docs: list, ids: list, top_n: int) -> list:
+        """Retourne les indices des top_n documents, du plus au moins pertinent."""
+        return list(range(min(top_n, len(docs))))
+
+
+class CohereReranker(Reranker):
+    name = "cohere"
+
+    def __init__(self, model: str = "rerank-v3.5"):
+        self.model = model
+        self.client = cohere.ClientV2(os.getenv("COHERE_API_KEY", "enter your password cohere API"),
+                                      base_url=COHERE_BASE_URL)
+
+    def rerank(self, query: str, docs: list, ids: list, top_n: int) -> list:
+        reranked = self.client.rerank(
+            model=self.model,
+            query=query,
+            documents=docs,
+            top_n=top_n
+        )
+        return [r.index for r in reranked.results]
+
+
+def _load_cross_encoder():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(CROSS_ENCODER_MODEL, device="cpu")
+
+registry.register("cross-encoder", _load_cross_encoder)
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Cross-encoder local : toutes les paires (question, chunk) sont scorées en une passe,
+    les scores sont mis en cache par (hash de la question, id du chunk).
+    """
+    name = "cross-encoder"
+
+    def __init__(self, cache_size: int = RERANK_SCORE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, docs: list, ids: list, top_n: int) -> list:
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        keys = [(query_hash, chunk_id) for chunk_id in ids]
+        with self._lock:
+            scores = {k: self._scores[k] for k in keys if k in self._scores}
+            for k in scores:
+                self._scores.move_to_end(k)
+
+        missing = [i for i, k in enumerate(keys) if k not in scores]
+        if missing:
+            with registry.use("cross-encoder") as model:
+                predicted = model.predict([(query, docs[i]) for i in missing], batch_size=len(missing))
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[keys[i]] = float(score)
+                    self._scores[keys[i]] = float(score)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+
+        order = sorted(range(len(docs)), key=lambda i: scores[keys[i]], reverse=True)
+        return order[:top_n]
+
+
+_BACKENDS = {
+    "cohere": CohereReranker,
+    "cross-encoder": CrossEncoderReranker,
+    "none": Reranker,
+}
+
+reranker = _BACKENDS[RERANKER_BACKEND]()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rerank")
+
+
+def rerank(query: str, docs: list, ids: list, top_n: int = 3, timeout: float = RERANK_TIMEOUT) -> list:
+    """
+    Rerank avec le backend configuré ; en cas d'erreur ou de dépassement du délai,
+    retombe sur l'ordre de la recherche vectorielle.
+    """
+    future = _executor.submit(reranker.rerank, query, docs, ids, top_n)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        count("rerank", "timeouts")
+        print(f"[WARN] Rerank {reranker.name} trop lent (> {timeout}s), ordre vectoriel conservé")
+    except Exception as e:
+        count("rerank", "failures")
+        print(f"[WARN] Rerank {reranker.name} en échec ({e}), ordre vectoriel conservé")
+    return list(range(min(top_n, len(docs))))
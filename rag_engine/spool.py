@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+
+# Répertoire des fichiers temporaires d'ingestion (uploads et textes extraits)
+SPOOL_DIR = os.getenv("RAG_SPOOL_DIR", tempfile.gettempdir())
+# Taille des blocs lus depuis l'upload
+UPLOAD_CHUNK_BYTES = int(os.getenv("RAG_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+
+def new_spool_path(suffix: str) -> str:
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="rag_", suffix=suffix, dir=SPOOL_DIR)
+    os.close(fd)
+    return path
+
+
+def remove_quietly(*paths):
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def write_units(units, path: str) -> int:
+    """Écrit les unités extraites (texte ou (texte, métadonnées)) en JSON lines."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for unit in units:
+            text, meta = unit if isinstance(unit, tuple) else (unit, {})
+            f.write(json.dumps({"text": text, "meta": meta}, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_units(path: str):
+    """Relit les unités une par une : la mémoire ne dépend pas de la taille du document."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield record["text"], record["meta"]
+
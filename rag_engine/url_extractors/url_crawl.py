@@ -0,0 +1,97 @@
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlsplit
+from bs4 import BeautifulSoup
+from rag_engine.web_fetcher import web_fetcher
+
+# Téléchargements simultanés ; le débit par hôte reste limité par le fetcher
+CRAWL_WORKERS = int(os.getenv("RAG_CRAWL_WORKERS", "8"))
+CRAWL_MAX_PAGES = int(os.getenv("RAG_CRAWL_MAX_PAGES", "50"))
+CRAWL_MAX_DEPTH = int(os.getenv("RAG_CRAWL_MAX_DEPTH", "2"))
+# Sitemaps imbriqués (sitemapindex) suivis au plus sur ce nombre de niveaux
+SITEMAP_MAX_NESTING = 3
+
+
+def is_sitemap(result) -> bool:
+    head = result.content[:2048].lstrip()
+    return "xml" in result.content_type and (b"<urlset" in head or b"<sitemapindex" in head)
+
+
+def parse_sitemap(content: bytes) -> tuple:
+    """Retourne (pages, sous-sitemaps) listés par un sitemap ou un index de sitemaps."""
+    root = ET.fromstring(content)
+    locs = [el.text.strip() for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "loc" and el.text]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+def extract_links(content: bytes, base_url: str) -> list:
+    """Liens http(s) de la page vers le même hôte, sans fragment, dans l'ordre du document."""
+    host = urlsplit(base_url).netloc
+    links = []
+    for a in BeautifulSoup(content, "html.parser").find_all("a", href=True):
+        url = urldefrag(urljoin(base_url, a["href"]))[0]
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https") and parts.netloc == host:
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+def _fetch_all(urls: list, pool: ThreadPoolExecutor) -> list:
+    def fetch(url):
+        try:
+            return web_fetcher.fetch(url)
+        except Exception as e:
+            # Un lien cassé ne fait pas échouer tout le crawl
+            print(f"[WARN] Crawl : {url} ignorée ({e})")
+            return None
+    return list(pool.map(fetch, urls))
+
+
+def _sitemap_pages(result, max_pages: int, pool: ThreadPoolExecutor) -> list:
+    pages, sitemaps = parse_sitemap(result.content)
+    for _ in range(SITEMAP_MAX_NESTING):
+        if not sitemaps or len(pages) >= max_pages:
+            break
+        nested = _fetch_all(sitemaps, pool)
+        sitemaps = []
+        for sub in filter(None, nested):
+            sub_pages, sub_sitemaps = parse_sitemap(sub.content)
+            pages.extend(sub_pages)
+            sitemaps.extend(sub_sitemaps)
+    return list(dict.fromkeys(pages))[:max_pages]
+
+
+def crawl_site(start_url: str, max_pages: int | None = None, max_depth: int | None = None,
+               workers: int = CRAWL_WORKERS) -> list:
+    """
+    Récupère les pages HTML d'un site depuis un sitemap (toutes ses pages) ou une URL
+    de départ (parcours en largeur, niveau par niveau, limité en profondeur et en pages).
+    Retourne les FetchResult dans l'ordre de découverte.
+    """
+    max_pages = max_pages or CRAWL_MAX_PAGES
+    max_depth = CRAWL_MAX_DEPTH if max_depth is None else max_depth
+    first = web_fetcher.fetch(start_url)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as pool:
+        if is_sitemap(first):
+            results = _fetch_all(_sitemap_pages(first, max_pages, pool), pool)
+            return [r for r in results if r is not None and r.is_html]
+
+        pages = [first] if first.is_html else []
+        seen = {start_url, first.url}
+        level = pages
+        for _ in range(max_depth):
+            frontier = []
+            for page in level:
+                for link in extract_links(page.content, page.url):
+                    if link not in seen and len(pages) + len(frontier) < max_pages:
+                        seen.add(link)
+                        frontier.append(link)
+            if not frontier:
+                break
+            level = [r for r in _fetch_all(frontier, pool) if r is not None and r.is_html]
+            pages.extend(level)
+        return pages
@@ -1,20 +1,22 @@
-import requests
-from bs4 import BeautifulSoup
-import tempfile
-from rag_engine.extractors.audio import transcribe_audio
-
-def extract_text_from_html(url: str) -> str:
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        for element in soup(["script", "style", "noscript"]):
-            element.extract()
-
-        text = soup.get_text(separator="\n")
-        return "\n".join(line.strip() for line in text.splitlines() if line.strip())
-
-    except Exception as e:
-        raise RuntimeError(f"Erreur lors de l'extraction HTML depuis {url}: {e}")
\ No newline at end of file
+from bs4 import BeautifulSoup
+from rag_engine.web_fetcher import web_fetcher
+
+# Balises sans contenu utile ; header/footer/nav se répètent sur toutes les pages d'un site
+BOILERPLATE_TAGS = ["script", "style", "noscript", "header", "footer", "nav"]
+
+
+def html_to_text(content) -> str:
+    soup = BeautifulSoup(content, "html.parser")
+
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+
+    text = soup.get_text(separator="\n")
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def extract_text_from_html(url: str) -> str:
+    try:
+        return html_to_text(web_fetcher.fetch(url).content)
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de l'extraction HTML depuis {url}: {e}")
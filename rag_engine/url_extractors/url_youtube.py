@@ -1,47 +1,51 @@
-import os
-import subprocess
-import whisper
-
-TRANSCRIPT_DIR = "transcript"
-AUDIO_FILE = "audio.mp3"
-
-
-def get_video_id(url: str) -> str:
-    if "watch?v=" in url:
-        return url.split("watch?v=")[1].split("&")[0]
-    elif "youtu.be/" in url:
-        return url.split("youtu.be/")[1]
-    raise ValueError("URL YouTube invalide.")
-
-def download_audio(url: str, output=AUDIO_FILE):
-    command = [
-        "yt-dlp", "-f", "bestaudio",
-        "--extract-audio", "--audio-format", "mp3",
-        "-o", output, url
-    ]
-    subprocess.run(command, check=True)
-
-def transcribe_audio(audio_file: str) -> str:
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_file, fp16=False)
-    return result["text"].strip()
-
-def extract_text_from_youtube(url: str) -> str:
-    video_id = get_video_id(url)
-    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
-    transcript_path = os.path.join(TRANSCRIPT_DIR, f"{video_id}.txt")
-
-    # Si le transcript existe déjà, on le lit
-    if os.path.exists(transcript_path):
-        with open(transcript_path, "r", encoding="utf-8") as f:
-            return f.read()
-
-    # Sinon, on télécharge et transcrit
-    download_audio(url)
-    text = transcribe_audio(AUDIO_FILE)
-
-    # On sauvegarde pour éviter de refaire à chaque fois
-    with open(transcript_path, "w", encoding="utf-8") as f:
-        f.write(text)
-
-    return text
+import os
+import subprocess
+import tempfile
+from rag_engine.extractors.long_audio import transcript_text
+from rag_engine.extractors.media import decode_pcm
+
+TRANSCRIPT_DIR = "transcript"
+
+
+def get_video_id(url: str) -> str:
+    if "watch?v=" in url:
+        return url.split("watch?v=")[1].split("&")[0]
+    elif "youtu.be/" in url:
+        return url.split("youtu.be/")[1]
+    raise ValueError("URL YouTube invalide.")
+
+def download_audio(url: str, output_dir: str) -> str:
+    # Flux audio d'origine, sans réencodage mp3 : ffmpeg le décode ensuite directement
+    command = [
+        "yt-dlp", "-f", "bestaudio",
+        "-o", os.path.join(output_dir, "audio.%(ext)s"),
+        "--print", "after_move:filepath", "--quiet", "--no-simulate",
+        url
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return result.stdout.strip().splitlines()[-1]
+
+def transcribe_audio(audio_file: str) -> str:
+    return transcript_text(decode_pcm(audio_file)).strip()
+
+def extract_text_from_youtube(url: str) -> str:
+    video_id = get_video_id(url)
+    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    transcript_path = os.path.join(TRANSCRIPT_DIR, f"{video_id}.txt")
+
+    # Si le transcript existe déjà, on le lit
+    if os.path.exists(transcript_path):
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    # Sinon, on télécharge dans un dossier propre à la requête (supprimé ensuite) et on transcrit
+    with tempfile.TemporaryDirectory() as tmpdir:
+        text = transcribe_audio(download_audio(url, tmpdir))
+
+    # On sauvegarde pour éviter de refaire à chaque fois ; écriture atomique entre requêtes concurrentes
+    fd, tmp_path = tempfile.mkstemp(dir=TRANSCRIPT_DIR, suffix=".tmp")
+    with open(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, transcript_path)
+
+    return text
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CACHE_PATH = os.getenv("RAG_HTTP_CACHE_PATH", "./http_cache.sqlite3")
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("RAG_HTTP_CACHE_MAX_ENTRIES", "5000"))
+HTTP_TIMEOUT = float(os.getenv("RAG_HTTP_TIMEOUT", "10"))
+# Connexions gardées ouvertes par hôte (partagées entre tous les threads)
+HTTP_POOL_SIZE = int(os.getenv("RAG_HTTP_POOL_SIZE", "16"))
+# Délai minimal entre deux requêtes vers le même hôte
+HTTP_HOST_INTERVAL = float(os.getenv("RAG_HTTP_HOST_INTERVAL", "0.2"))
+HTTP_USER_AGENT = os.getenv("RAG_HTTP_USER_AGENT", "chatbot-rag/1.0 (+document ingestion)")
+
+
+class FetchResult:
+    def __init__(self, url: str, status: int, content: bytes, content_type: str, unchanged: bool, content_hash: str):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.content_type = content_type
+        # Contenu identique au précédent téléchargement (304, ou même corps) ; ne dit pas
+        # si cette version a été indexée : comparer content_hash au manifeste d'index
+        self.unchanged = unchanged
+        self.content_hash = content_hash
+
+    @property
+    def is_html(self) -> bool:
+        return "html" in self.content_type or not self.content_type
+
+
+class HttpCache:
+    """
+    Cache disque (SQLite) des réponses HTTP : corps, ETag et Last-Modified par URL,
+    pour les requêtes conditionnelles. Éviction LRU au-delà de max_entries.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_type TEXT, "
+            "content BLOB, hash TEXT, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_type, content, hash FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return dict(zip(("etag", "last_modified", "content_type", "content", "hash"), row))
+
+    def put(self, url: str, etag: str | None, last_modified: str | None, content_type: str, content: bytes, h: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, etag, last_modified, content_type, content, hash, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_type, content, h, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+class HostRateLimiter:
+    """Espace les requêtes vers un même hôte d'au moins `interval` secondes."""
+
+    def __init__(self, interval: float = HTTP_HOST_INTERVAL):
+        self.interval = interval
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if self.interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class WebFetcher:
+    """
+    Session HTTP partagée (connexions réutilisées, relances sur erreurs transitoires)
+    avec GET conditionnels : une page inchangée n'est ni re-téléchargée ni ré-analysée.
+    """
+
+    def __init__(self, cache: HttpCache | None = None, host_interval: float = HTTP_HOST_INTERVAL):
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = HTTP_USER_AGENT
+        self.limiter = HostRateLimiter(host_interval)
+        self._cache = cache
+        self._cache_lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    @property
+    def cache(self) -> HttpCache:
+        # Ouvert au premier usage : les processus d'extraction qui ne lisent pas d'URL n'y touchent pas
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = HttpCache()
+        return self._cache
+
+    def fetch(self, url: str) -> FetchResult:
+        cached = self.cache.get(url)
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.limiter.wait(url)
+        response = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        self.requests += 1
+        if response.status_code == 304 and cached:
+            self.not_modified += 1
+            return FetchResult(url, 304, cached["content"], cached["content_type"], True, cached["hash"])
+        response.raise_for_status()
+
+        content = response.content
+        content_type = response.headers.get("Content-Type", "").lower()
+        h = hashlib.sha256(content).hexdigest()
+        self.cache.put(url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                       content_type, content, h)
+        return FetchResult(response.url, response.status_code, content, content_type,
+                           cached is not None and cached["hash"] == h, h)
+
+
+web_fetcher = WebFetcher()